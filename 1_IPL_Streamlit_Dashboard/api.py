@@ -1,50 +1,275 @@
-from flask import Flask, request, jsonify
-from ipl import IPL
+import os
+import glob
+import json
+import time
+import threading
+import contextlib
+import pandas as pd
+import numpy as np
+from flask import Flask, Blueprint, request, jsonify, current_app, g
+from flask.json.provider import DefaultJSONProvider
+from ipl import IPL, QUERY_DIMENSIONS
+from profiling import METRICS, profiled, stage
 
-app = Flask(__name__)
-@app.route('/')
+try:
+    import orjson
+except ImportError: # the standard library encoder is used instead
+    orjson = None
+
+IPL_MATCHES = "./data/IPL_Matches_2008_2022.csv" or "https://docs.google.com/spreadsheets/d/e/2PACX-1vRy2DUdUbaKx_Co9F0FSnIlyS-8kp4aKv_I0-qzNeghiZHAI_hw94gKG22XTxNJHMFnFVKsO4xWOdIs/pub?gid=1655759976&single=true&output=csv"
+IPL_BALLS = "data/IPL_Ball_by_Ball_2008_2022.csv" or "https://docs.google.com/spreadsheets/d/e/2PACX-1vRu6cb6Pj8C9elJc5ubswjVTObommsITlNsFy5X0EiBY7S-lsHEUqx3g_M16r50Ytjc0XQCdGDyzE_Y/pub?output=csv"
+
+# New matches are picked up from <name>_matches.csv / <name>_balls.csv pairs dropped here
+INCOMING_DIR = "data/incoming"
+
+# Requests sent with this header get their stage timings back in Server-Timing and the full profile as JSON,
+# when profiling is enabled: allocation tracing slows every request of the worker down, so it is off by default
+PROFILE_HEADER = "X-IPL-Profile"
+PROFILING = os.environ.get('IPL_PROFILING') == '1'
+
+api = Blueprint('api', __name__)
+
+
+def to_builtin(obj):
+    """JSON fallback for NumPy scalars and arrays that leak into responses."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return DefaultJSONProvider.default(obj)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Encodes responses with orjson when it is installed, keeping Flask's sorted keys."""
+    default = staticmethod(to_builtin)
+    options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS if orjson else None
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=to_builtin, option=self.options).decode()
+
+    def response(self, *args, **kwargs):
+        with stage('api.encode') as step:
+            if orjson is None:
+                response = super().response(*args, **kwargs)
+            else:
+                # Skips the bytes -> str -> bytes round trip of dumps()
+                obj = self._prepare_response_obj(args, kwargs)
+                response = self._app.response_class(orjson.dumps(obj, default=to_builtin, option=self.options), mimetype=self.mimetype)
+            step.bytes += response.content_length or 0
+        return response
+
+
+def dataset():
+    """The IPL currently served; the watcher may swap it for a newer one between requests."""
+    return current_app.config['IPL']
+
+
+# Registered first, so its after_request handler runs last and times the whole request
+@api.before_request
+def start_request():
+    g.started = time.perf_counter()
+    g.profiling = contextlib.ExitStack()
+    if current_app.config['IPL_PROFILING'] and request.headers.get(PROFILE_HEADER):
+        g.profile = g.profiling.enter_context(profiled())
+
+@api.after_request
+def record_request(response):
+    seconds = time.perf_counter() - g.started
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    METRICS.observe_request(endpoint, response.status_code, seconds)
+
+    profile = g.get('profile')
+    if profile is not None:
+        stages = ', '.join(f'{stage.name};dur={stage.seconds * 1000:.3f}' for stage in profile.stages)
+        response.headers['Server-Timing'] = stages + (', ' if stages else '') + f'total;dur={seconds * 1000:.3f}'
+        response.headers[PROFILE_HEADER] = json.dumps({'endpoint': endpoint, 'ms': round(seconds * 1000, 3), **profile.as_dict()}, separators=(',', ':'))
+    return response
+
+@api.teardown_request
+def end_request(exc):
+    if 'profiling' in g:
+        g.profiling.close()
+
+# API responses only change when the dataset does, so its version serves as the ETag of every route
+@api.before_request
+def not_modified():
+    ipl = dataset()
+    if request.path.startswith('/api/') and request.if_none_match.contains(ipl.version):
+        response = current_app.response_class(status=304)
+        response.set_etag(ipl.version)
+        response.last_modified = ipl.last_modified
+        return response
+
+@api.after_request
+def add_validators(response):
+    if request.path.startswith('/api/') and response.status_code == 200:
+        ipl = dataset()
+        response.set_etag(ipl.version)
+        response.last_modified = ipl.last_modified
+        response = response.make_conditional(request)
+    return response
+
+@api.route('/')
 def home():
     return 'Hello, World!'
 
-@app.route('/api/teams')
+@api.route('/metrics')
+def metrics():
+    # Prometheus text format; under gunicorn every worker keeps and reports its own numbers
+    body = METRICS.exposition(dataset().response_cache.stats())
+    return current_app.response_class(body, mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/teams')
 def teams():
-    teams = ipl.allTeams_API()
+    teams = dataset().allTeams_API()
     return jsonify(teams)
 
-@app.route('/api/allPlayers')
+@api.route('/api/allPlayers')
 def all_players():
-    players = ipl.allPlayers_API()
+    players = dataset().allPlayers_API()
     return jsonify(players)
 
-@app.route('/api/teamPlayers')
+@api.route('/api/teamPlayers')
 def team_players():
     team = request.args.get('team')
-    players = ipl.teamPlayers_API(team)
+    players = dataset().teamPlayers_API(team)
     return jsonify(players)
 
-@app.route('/api/teamRecord')
+@api.route('/api/appearances')
+def appearances():
+    # e.g. /api/appearances?player=V%20Kohli&season=2021
+    response = dataset().playerAppearances_API(request.args.get('player'), seasons=request.args.getlist('season') or ['All'])
+    return jsonify(response)
+
+@api.route('/api/teamRecord')
 def team_record():
     team = request.args.get('team')
-    response = ipl.teamRecord_API(team)
+    response = dataset().teamRecord_API(team)
     return jsonify(response)
 
-@app.route('/api/batsmanRecord')
+@api.route('/api/batsmanRecord')
 def batsman_record():
     batsman = request.args.get('batsman')
-    response = ipl.batsmanRecord_API(batsman)
+    response = dataset().batsmanRecord_API(batsman)
     return jsonify(response)
 
-@app.route('/api/bowlerRecord')
+@api.route('/api/bowlerRecord')
 def bowler_record():
     bowler = request.args.get('bowler')
-    response = ipl.bowlerRecord_API(bowler)
+    response = dataset().bowlerRecord_API(bowler)
+    return jsonify(response)
+
+@api.route('/api/leaderboard')
+def leaderboard():
+    # e.g. /api/leaderboard?kind=bowling&sort_by=Economy&order=asc&min_innings=20&season=2021&season=2022
+    response = dataset().leaderboard_API(
+        kind=request.args.get('kind', 'batting'),
+        seasons=request.args.getlist('season') or ['All'],
+        sort_by=request.args.get('sort_by'),
+        ascending=request.args.get('order', 'desc') == 'asc',
+        min_innings=request.args.get('min_innings', 0, type=int),
+        limit=min(request.args.get('limit', 10, type=int), 100),
+        offset=request.args.get('offset', 0, type=int),
+    )
+    return jsonify(response)
+
+
+@api.route('/api/headToHead')
+def head_to_head():
+    # e.g. /api/headToHead?batter=V%20Kohli&bowler=JJ%20Bumrah&season=2021
+    response = dataset().headToHead_API(
+        request.args.get('batter'),
+        request.args.get('bowler'),
+        seasons=request.args.getlist('season') or ['All'],
+    )
+    return jsonify(response)
+
+@api.route('/api/topMatchups')
+def top_matchups():
+    # e.g. /api/topMatchups?player=JJ%20Bumrah&role=bowler&sort_by=Dismissals&min_balls=30
+    response = dataset().topMatchups_API(
+        request.args.get('player'),
+        role=request.args.get('role', 'batter'),
+        sort_by=request.args.get('sort_by', 'Runs'),
+        seasons=request.args.getlist('season') or ['All'],
+        min_balls=request.args.get('min_balls', 0, type=int),
+        limit=min(request.args.get('limit', 10, type=int), 100),
+    )
+    return jsonify(response)
+
+@api.route('/api/query')
+def query():
+    # e.g. /api/query?family=batting&phase=death&season=2022&group_by=batter&sort_by=Strike%20Rate&limit=10
+    response = dataset().query_API(
+        family=request.args.get('family', 'batting'),
+        filters={dimension: request.args.getlist(dimension) for dimension in QUERY_DIMENSIONS if dimension in request.args},
+        group_by=request.args.getlist('group_by'),
+        metrics=request.args.getlist('metric') or None,
+        sort_by=request.args.get('sort_by'),
+        ascending=request.args.get('order', 'desc') == 'asc',
+        limit=min(request.args.get('limit', 100, type=int), 1000),
+    )
     return jsonify(response)
 
+def create_app(ipl_matches=IPL_MATCHES, ipl_balls=IPL_BALLS, ipl=None, warm_up='background', profiling=PROFILING):
+    """Build the API around an IPL dataset, loading it from the CSVs unless one is given.
+
+    warm_up is when the dataset is loaded: 'eager' before returning, 'background' in a thread while
+    the first requests are served, or 'lazy', table by table as requests need them. The PROFILE_HEADER
+    of requests is ignored unless profiling is true (IPL_PROFILING=1).
+    """
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    if ipl is None:
+        ipl = IPL(ipl_matches, ipl_balls, warm_up=warm_up == 'background')
+        if warm_up == 'eager':
+            ipl.warm_up()
+    app.config['IPL'] = ipl
+    app.config['IPL_PROFILING'] = profiling
+    app.register_blueprint(api)
+    return app
+
+
+def watch_incoming(app, interval=30):
+    """Append every complete pair of files in INCOMING_DIR to the dataset served by app, oldest name first."""
+    seen = {} # pair -> modification time it was last applied (or rejected) at
+    while True:
+        for matches_path in sorted(glob.glob(os.path.join(INCOMING_DIR, '*_matches.csv'))):
+            balls_path = matches_path[:-len('_matches.csv')] + '_balls.csv'
+            if not os.path.exists(balls_path):
+                continue # the balls file is still being copied
+
+            # Files are left in place: every worker process applies them to its own copy of the dataset,
+            # and a restarted server re-applies them on top of the base CSVs
+            mtime = max(os.path.getmtime(matches_path), os.path.getmtime(balls_path))
+            if seen.get(matches_path) == mtime:
+                continue
+            seen[matches_path] = mtime
+
+            try:
+                # Requests already running keep the object they started on; new ones get the new dataset
+                app.config['IPL'] = app.config['IPL'].append_matches(pd.read_csv(matches_path), pd.read_csv(balls_path))
+                print(f"[{os.getpid()}] Appended", matches_path, "dataset version", app.config['IPL'].version)
+            except ValueError as e:
+                print(f"[{os.getpid()}] Rejected", matches_path, e)
+            except Exception as e: # one bad pair must not stop the watcher for good
+                print(f"[{os.getpid()}] Failed to append", matches_path, f"{type(e).__name__}: {e}")
+        time.sleep(interval)
+
+
+def start_watcher(app, interval=30):
+    threading.Thread(target=watch_incoming, args=(app, interval), daemon=True).start()
 
 
 if __name__ == '__main__':
-    ipl_matches = "./data/IPL_Matches_2008_2022.csv" or "https://docs.google.com/spreadsheets/d/e/2PACX-1vRy2DUdUbaKx_Co9F0FSnIlyS-8kp4aKv_I0-qzNeghiZHAI_hw94gKG22XTxNJHMFnFVKsO4xWOdIs/pub?gid=1655759976&single=true&output=csv"
-    ipl_balls = "data/IPL_Ball_by_Ball_2008_2022.csv" or "https://docs.google.com/spreadsheets/d/e/2PACX-1vRu6cb6Pj8C9elJc5ubswjVTObommsITlNsFy5X0EiBY7S-lsHEUqx3g_M16r50Ytjc0XQCdGDyzE_Y/pub?output=csv"
-    ipl = IPL(ipl_matches, ipl_balls)
-    
+    # Development server; for production use `gunicorn -c gunicorn.conf.py wsgi:app`
+    # Only the serving process of the debug reloader loads the dataset
+    app = create_app(warm_up='background' if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' else 'lazy')
+
+    # Only the serving process of the debug reloader watches, so files are not picked up twice
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_watcher(app)
+
     app.run(debug=True)
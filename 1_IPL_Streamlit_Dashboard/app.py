@@ -5,20 +5,83 @@ import numpy as np
 import streamlit as st
 import plotly.express as px
 from ipl import IPL
-from typing import List, Dict
+from shared import SharedDataset
+from typing import List, Dict, Tuple
+
+IPL_MATCHES = "data/IPL_Matches_2008_2022.csv"
+IPL_BALLS = "data/IPL_Ball_by_Ball_2008_2022.csv"
+
+
+@st.cache_resource(show_spinner="Loading IPL data...")
+def shared_ipl():
+    """The IPL dataset of this process, loaded once and shared read-only by every browser session."""
+    # The first page only needs the small matches file; the rest loads in the background meanwhile
+    return SharedDataset(lambda: IPL(IPL_MATCHES, IPL_BALLS, warm_up=True), sources=[IPL_MATCHES, IPL_BALLS])
+
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def record_frames(_ipl, version, section_type, entity, seasons):
+    """Record of a team or player plus its against-team and per-season frames, melted for plotting.
+
+    Cached per (section, entity, seasons) and dataset version, so reruns that only change the chart
+    (type, metrics, hover) reuse them instead of fetching and reshaping the record again.
+    """
+    record_api = {'team': _ipl.teamRecord_API, 'batting': _ipl.batsmanRecord_API, 'bowling': _ipl.bowlerRecord_API}[section_type]
+    data = record_api(entity, list(seasons))
+    if not data.get('against') or not data['against'].get('team') or not data['against'].get('season'):
+        return data, None
+
+    # Convert data to DataFrame and melt for easier plotting
+    team_data = pd.DataFrame.from_dict(data['against']['team'], orient='index').reset_index().rename(columns={'index': 'Team'})
+    season_data = pd.DataFrame.from_dict(data['against']['season'], orient='index').reset_index().rename(columns={'index': 'Season'})
+
+    # Drop non-plot columns
+    for frame in (team_data, season_data):
+        frame.drop(columns=['Best Figure', 'Best Figure Fraction'], inplace=True, errors='ignore')
+
+    team_df_melted = pd.melt(team_data, id_vars='Team', value_vars=team_data.columns[1:], var_name='Metric', value_name='Value')
+    season_df_melted = pd.melt(season_data, id_vars='Season', value_vars=season_data.columns[1:], var_name='Metric', value_name='Value')
+    return data, (team_data, season_data, team_df_melted, season_df_melted)
+
+
+CHART_TYPES = ['Bar', 'Line', 'Scatter', 'Strip', 'Histogram', 'Pie', 'Sunburst']
+
+
+@st.cache_resource(max_entries=512, show_spinner=False)
+def performance_figure(key, index, graph_type, metrics, hover_mode, title, _original_df, _melted_df):
+    """Chart of the record_frames of `key`, cached per chart options so revisiting a chart skips plotly.
+    The figure is shared between sessions and must not be modified after this."""
+    if graph_type == 'Bar':
+        fig = px.bar(_melted_df, x=index, y='Value', color='Metric', barmode='group', labels={index: index, 'Value': 'Value'})
+    elif graph_type == 'Line':
+        fig = px.line(_melted_df, x=index, y='Value', color='Metric')
+        fig.update_traces(mode='lines+markers')
+    elif graph_type == 'Scatter':
+        if len(metrics) == 2:
+            fig = px.scatter(_original_df, x=metrics[0], y=metrics[1], color=index, hover_name=index)
+        else:
+            _size = _original_df[metrics[2]].str.replace('*', '').astype(np.int32) if _original_df[metrics[2]].dtype == 'object' and metrics[2] == 'HighestScore' else _original_df[metrics[2]]
+            fig = px.scatter(_original_df, x=metrics[0], y=metrics[1], size=_size, color=index, hover_name=index, size_max=_size.max())
+    elif graph_type == 'Strip':
+        fig = px.strip(_melted_df, x=index, y='Value', color='Metric')
+    elif graph_type == 'Histogram':
+        fig = px.histogram(_melted_df, x=index, y='Value', color='Metric')
+    elif graph_type == 'Pie':
+        fig = px.pie(_melted_df, names=index, values='Value', color=index, labels={index: index, 'Value': 'Value'})
+    else: # Sunburst
+        fig = px.sunburst(_melted_df, path=[index, 'Metric'], values='Value', color=index,color_continuous_scale='RdBu', color_continuous_midpoint=np.average(_melted_df['Value'], weights=_melted_df['Value']), labels={index: index, 'Value': 'Value'}, hover_data={'Value': ':.2f'}, hover_name=index, branchvalues='total', maxdepth=2) # best for fours and sixes against each team
+
+    if hover_mode: fig.update_layout(hovermode='x')
+    fig.update_layout(title = title, legend_title='Metric', width=750)
+    return fig
+
 
 class IPLDashboard:
     """IPL Insights Dashboard to analyze IPL data."""
     
-    def __init__(self):
-        # Use Streamlit session state to initialize IPL object once and reuse it across reruns
-        if 'ipl' not in st.session_state:
-            ipl_matches = "data/IPL_Matches_2008_2022.csv"
-            ipl_balls = "data/IPL_Ball_by_Ball_2008_2022.csv"
-            st.session_state['ipl'] = IPL(ipl_matches, ipl_balls)
-
-        # Access the IPL object from the session state
-        self.ipl = st.session_state['ipl']
+    def __init__(self, ipl):
+        # The IPL object is shared by all sessions; session state only keeps this session's selections
+        self.ipl = ipl
                 
         # Set up the Streamlit sidebar and main layout
         st.set_page_config(page_title="IPL Insights Explorer", initial_sidebar_state="collapsed", layout="wide")
@@ -124,13 +187,14 @@ class IPLDashboard:
             return
 
         # Get team data
-        data = self.ipl.teamRecord_API(self.selected_team, self.selected_season)
+        key = (self.ipl.version, 'team', self.selected_team, tuple(self.selected_season))
+        data, frames = record_frames(self.ipl, *key)
         if not data:
             st.info('No data available.')
             return
 
         self.display_overall_stats(data) 
-        self.display_performance_visualizations(data, 'team')
+        self.display_performance_visualizations(frames, 'team', key)
 
     def render_batting_insights(self):
         """Render batting insights section."""
@@ -140,13 +204,14 @@ class IPLDashboard:
         st.write(f"Player: {self.selected_player}")
 
         # Get player batting data
-        data = self.ipl.batsmanRecord_API(self.selected_player, self.selected_season)
+        key = (self.ipl.version, 'batting', self.selected_player, tuple(self.selected_season))
+        data, frames = record_frames(self.ipl, *key)
         if not data:
             st.info('No data available.')
             return
 
         self.display_overall_stats(data)
-        self.display_performance_visualizations(data, 'batting')
+        self.display_performance_visualizations(frames, 'batting', key)
 
     def render_bowling_insights(self):
         """Render bowling insights section."""
@@ -156,13 +221,14 @@ class IPLDashboard:
         st.write(f"Player: {self.selected_player}")
         
         # Get player bowling data
-        data = self.ipl.bowlerRecord_API(self.selected_player, self.selected_season)
+        key = (self.ipl.version, 'bowling', self.selected_player, tuple(self.selected_season))
+        data, frames = record_frames(self.ipl, *key)
         if not data:
             st.info('No data available.')
             return
 
         self.display_overall_stats(data) # self.new_line()
-        self.display_performance_visualizations(data, 'bowling')
+        self.display_performance_visualizations(frames, 'bowling', key)
 
     def render_player_vs_player_insights(self):
         """Render player vs player insights section."""
@@ -171,16 +237,56 @@ class IPLDashboard:
         st.write(f"Player 1: {self.selected_player1}")
         st.write(f"Player 2: {self.selected_player2}")
 
-        st.info('This feature is under development. Please check back later for updates.')
-        st.info('Last updated: 2024-04-24')
+        # Ensure user has selected a season
+        if not self.selected_season:
+            st.warning('Please select season')
+            return
 
-        # Get data for players' comparison
-        # data = self.ipl.player_vs_player_API(self.selected_player1, self.selected_player2, self.selected_season)
-        # if not data:
-        #     st.info('No data available.')
-        #     return
-        
-        # self.display_performance_visualizations(data, 'player_vs_player')
+        # Get data for players' comparison, both players are computed in one batch
+        data = self.ipl.playerComparison_API(self.selected_player1, self.selected_player2, seasons=self.selected_season)
+        if not data or data.get('error'):
+            st.info('No data available.')
+            return
+
+        self.new_line()
+        self.display_comparison(data['batsman_comparison'], 'Batting', 'batting')
+        self.display_comparison(data['bowler_comparison'], 'Bowling', 'bowling')
+        self.display_head_to_head(self.selected_player1, self.selected_player2)
+        self.display_head_to_head(self.selected_player2, self.selected_player1)
+
+    def display_head_to_head(self, batter: str, bowler: str):
+        """Display how a batter fared against a bowler, overall and by season."""
+        st.header(f"{batter} vs {bowler}")
+        data = self.ipl.headToHead_API(batter, bowler, seasons=self.selected_season)
+        if data.get('error') or not data['season']:
+            st.info(f"{batter} never faced {bowler} in the selected seasons.")
+            return
+
+        st.dataframe(pd.DataFrame({'Overall': data['overall'], **data['season']}).astype(str))
+
+    def display_comparison(self, data: Dict, title: str, section_type: str):
+        """Display overall stats side by side and a season-wise chart for compared players."""
+        st.header(f"{title} Comparison")
+
+        overall = pd.DataFrame({player: record['overall'] for player, record in data.items()})
+        st.dataframe(overall.astype(str))
+
+        seasons = [
+            {'Season': season, 'Player': player, **stats}
+            for player, record in data.items()
+            for season, stats in record['against']['season'].items()
+        ]
+        if not seasons:
+            st.info("No season data available for comparison.")
+            return
+
+        season_data = pd.DataFrame(seasons).drop(columns=['Highest Score', 'Best Figure Fraction'], errors='ignore')
+        default_metric = self.define_metrics(section_type)[-1]
+        metrics = season_data.columns[2:].tolist()
+        metric = st.selectbox(f'Select {title.lower()} metric:', metrics, index=metrics.index(default_metric))
+        fig = px.bar(season_data, x='Season', y=metric, color='Player', barmode='group')
+        fig.update_layout(title=f'{metric} by Season', width=750)
+        st.plotly_chart(fig)
 
 
     def display_overall_stats(self, data: Dict):
@@ -203,27 +309,18 @@ class IPLDashboard:
         self.new_line()
 
 
-    def display_performance_visualizations(self, data: Dict, section_type: str):
-        """Display performance visualizations based on data and section type."""
+    def display_performance_visualizations(self, frames: Tuple, section_type: str, key: Tuple):
+        """Display performance visualizations of the frames record_frames built for `key`."""
         st.header("Performance Visualizations")
 
-        if not data.get('against') or not data['against'].get('team') or not data['against'].get('season'):
+        if frames is None:
             st.info("No data available for performance visualizations.")
             return
-        
-        # Convert data to DataFrame and melt for easier plotting
-        team_data = pd.DataFrame.from_dict(data['against']['team'], orient='index').reset_index().rename(columns={'index': 'Team'})
-        season_data = pd.DataFrame.from_dict(data['against']['season'], orient='index').reset_index().rename(columns={'index': 'Season'})
-
-        # Drop non-plot columns
-        self.drop_non_plot_columns(team_data, season_data)
-
-        team_df_melted = pd.melt(team_data, id_vars='Team', value_vars=team_data.columns[1:], var_name='Metric', value_name='Value')
-        season_df_melted = pd.melt(season_data, id_vars='Season', value_vars=season_data.columns[1:], var_name='Metric', value_name='Value')
+        team_data, season_data, team_df_melted, season_df_melted = frames
 
         # Select chart type and metrics
         default_metrics = self.define_metrics(section_type)
-        graph_type = st.selectbox('Select chart type:', ['Bar', 'Line', 'Scatter', 'Strip', 'Histogram', 'Pie', 'Sunburst'], index=0, help='Select the type of chart to display')
+        graph_type = st.selectbox('Select chart type:', CHART_TYPES, index=0, help='Select the type of chart to display')
         selected_metrics = st.multiselect('Select Metrics:', team_data.columns[1:], default=default_metrics) # col names of team_data or season_data will be same for section_type
         
         # Filter data based on selected metrics
@@ -233,13 +330,8 @@ class IPLDashboard:
         # Plot metrics
         hover_mode = st.toggle('Enable hover mode', True)
         self.new_line()
-        self.plot_metrics('Team', hover_mode, graph_type, selected_metrics, team_data, team_df_filtered)
-        self.plot_metrics('Season', hover_mode, graph_type, selected_metrics, season_data, season_df_filtered)
-
-    def drop_non_plot_columns(self, team_data: pd.DataFrame, season_data: pd.DataFrame):
-        """Drop non-plot columns from the dataframes."""
-        season_data.drop(columns=['Best Figure', 'Best Figure Fraction'], inplace=True, errors='ignore')
-        team_data.drop(columns=['Best Figure', 'Best Figure Fraction'], inplace=True, errors='ignore')
+        self.plot_metrics('Team', hover_mode, graph_type, selected_metrics, team_data, team_df_filtered, key)
+        self.plot_metrics('Season', hover_mode, graph_type, selected_metrics, season_data, season_df_filtered, key)
 
     def define_metrics(self, section_type: str) -> (List[str]):
         """Define metrics and chart title based on section type."""
@@ -253,55 +345,35 @@ class IPLDashboard:
             raise ValueError("Invalid section type. Please provide a valid section type (batting or bowling).")
         return metrics
 
-    def plot_metrics(self, index: str, hover_mode: bool, graph_type: str, metrics: List[str], original_df: pd.DataFrame, melted_df: pd.DataFrame):
+    def plot_metrics(self, index: str, hover_mode: bool, graph_type: str, metrics: List[str], original_df: pd.DataFrame, melted_df: pd.DataFrame, key: Tuple):
         """Plot metrics based on selected chart type and metrics."""
         if not metrics:
             return
 
-        fig = None
-        if graph_type == 'Bar':
-            fig = px.bar(melted_df, x=index, y='Value', color='Metric', barmode='group', labels={index: index, 'Value': 'Value'})
-        elif graph_type == 'Line':
-            fig = px.line(melted_df, x=index, y='Value', color='Metric')
-            fig.update_traces(mode='lines+markers')
-        elif graph_type == 'Scatter':
-            if len(metrics) >= 2:
-                if len(metrics) == 2:
-                    fig = px.scatter(original_df, x=metrics[0], y=metrics[1], color=index, hover_name=index)
-                else:
-                    if len(metrics) > 3:
-                        st.warning('Scatter plot can only display 3 metrics at a time. Selecting first 3 metrics.')
-                    _size = original_df[metrics[2]].str.replace('*', '').astype(np.int32) if original_df[metrics[2]].dtype == 'object' and metrics[2] == 'HighestScore' else original_df[metrics[2]]
-                    fig = px.scatter(original_df, x=metrics[0], y=metrics[1], size=_size, color=index, hover_name=index, size_max=_size.max())
-            else:
-                st.error('Scatter plot requires at least 2 metrics to be selected.')
-        elif graph_type == 'Strip':
-            fig = px.strip(melted_df, x=index, y='Value', color='Metric')
-        elif graph_type == 'Histogram':
-            fig = px.histogram(melted_df, x=index, y='Value', color='Metric')
-        elif graph_type == 'Pie':
-            if len(metrics) == 1:
-                fig = px.pie(melted_df, names=index, values='Value', color=index, labels={index: index, 'Value': 'Value'})
-            else:
-                st.error('Please select exactly one metric for a pie chart.')
-        elif graph_type == 'Sunburst':
-            fig = px.sunburst(melted_df, path=[index, 'Metric'], values='Value', color=index,color_continuous_scale='RdBu', color_continuous_midpoint=np.average(melted_df['Value'], weights=melted_df['Value']), labels={index: index, 'Value': 'Value'}, hover_data={'Value': ':.2f'}, hover_name=index, branchvalues='total', maxdepth=2) # best for fours and sixes against each team
-        else:
+        if graph_type not in CHART_TYPES:
             st.warning('Invalid chart type selected.')
             return
+        elif graph_type == 'Scatter' and len(metrics) < 2:
+            st.error('Scatter plot requires at least 2 metrics to be selected.')
+            return
+        elif graph_type == 'Scatter' and len(metrics) > 3:
+            st.warning('Scatter plot can only display 3 metrics at a time. Selecting first 3 metrics.')
+        elif graph_type == 'Pie' and len(metrics) != 1:
+            st.error('Please select exactly one metric for a pie chart.')
+            return
+
+        Dash = ''
+        if self.area_option in ['Team','Batting','Bowling','Player']:
+            Dash = 'Team\'s' if self.area_option == 'Team' else 'Player\'s' # update Dash based on area option
+        else:
+            raise ValueError("Invalid area option. Please provide a valid area option (Team, Batting, Bowling, Player vs Player).")
 
         # Display the chart
-        if fig:
-            if hover_mode: fig.update_layout(hovermode='x')
-            Dash = ''
-            if self.area_option in ['Team','Batting','Bowling','Player']:
-                Dash = 'Team\'s' if self.area_option == 'Team' else 'Player\'s' # update Dash based on area option
-            else:
-                raise ValueError("Invalid area option. Please provide a valid area option (Team, Batting, Bowling, Player vs Player).")
-            fig.update_layout(title = Dash + ' Performance against Each ' + index, legend_title='Metric', width=750)
-            st.plotly_chart(fig)
+        fig = performance_figure(key, index, graph_type, tuple(metrics), hover_mode, Dash + ' Performance against Each ' + index, original_df, melted_df)
+        st.plotly_chart(fig)
 
 # Run the dashboard
 if __name__ == '__main__':
-    IPLDashboard()
+    with shared_ipl().lease() as ipl:
+        IPLDashboard(ipl)
 
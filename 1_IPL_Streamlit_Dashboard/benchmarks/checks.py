@@ -0,0 +1,131 @@
+"""Regression checks of IPL on the synthetic 1x data, for behaviour the timings of suite.py do not cover.
+
+Works offline and exits with an error on the first failed check. Run from the dashboard folder:
+
+    python benchmarks/checks.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+from ipl import IPL
+from api import PROFILE_HEADER, create_app
+from synthetic import generate
+from suite import DATA_DIR, PeakMemory, append_case
+
+# Peak memory limits in MiB, with room over the 1x figures (from CSV 149, from the snapshot 57, a
+# record 0.1); one request copying a shared table, as the record methods once did, takes 20-40
+LOAD_PEAK_MIB = {'CSV': 250, 'snapshot': 120}
+REQUEST_PEAK_MIB = 2
+
+
+def check_append_version(paths, snapshot_dir):
+    """An appended dataset keeps its own version through a later warm_up."""
+    ipl = IPL(*paths, snapshot_dir=snapshot_dir)
+    ipl.warm_up()
+    _, append = append_case(ipl)
+    appended = append()
+    version = appended.version
+    assert version != ipl.version, "append_matches did not change the version"
+    appended.warm_up()
+    assert appended.version == version, f"warm_up reset the version of the appended dataset to {appended.version}"
+
+
+def check_empty_comparison(paths, snapshot_dir):
+    """A comparison of no players is empty, and one without seasons is refused."""
+    ipl = IPL(*paths, snapshot_dir=snapshot_dir)
+    assert ipl.playerComparison_API() == {'batsman_comparison': {}, 'bowler_comparison': {}}, "comparison of no players is not empty"
+    player = ipl.allPlayers_API()['players'][0]
+    assert 'error' in ipl.playerComparison_API(player, seasons=[]), "comparison without seasons is not refused"
+
+
+def check_query_bowling(paths, snapshot_dir):
+    """The bowling figures of /api/query are those of the bowler's record, defined the same way."""
+    ipl = IPL(*paths, snapshot_dir=snapshot_dir)
+    rows = ipl.query_API('bowling', group_by=['bowler'], sort_by='Wickets', limit=10)['rows']
+    for row in rows:
+        record = ipl.bowlerRecord_API(row['bowler'])['overall']
+        for metric in ('Wickets', 'Average', 'Economy', 'Strike Rate'):
+            assert abs(float(row[metric]) - float(record[metric])) < 0.011, f"{metric} of {row['bowler']!r} is {row[metric]} in query_API, {record[metric]} in bowlerRecord_API"
+
+
+def check_snapshot_rebuild(paths, snapshot_dir):
+    """A process that found the snapshot fresh still loads its own data after another process rebuilt
+    the snapshot from other files."""
+    first = IPL(*paths, snapshot_dir=snapshot_dir)
+    first.warm_up()
+    reader = IPL(*paths, snapshot_dir=snapshot_dir)
+    reader.matches # the manifest is checked here
+    assert reader.snapshot_fresh, "the snapshot just written is not fresh"
+
+    # The other files hold half the deliveries
+    folder = tempfile.mkdtemp(prefix='ipl-checks-other-')
+    try:
+        other = [os.path.join(folder, os.path.basename(path)) for path in paths]
+        shutil.copy(paths[0], other[0])
+        with open(paths[1]) as source, open(other[1], 'w') as half:
+            lines = source.readlines()
+            half.writelines(lines[:len(lines) // 2])
+        IPL(*other, snapshot_dir=snapshot_dir).warm_up()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    reader.warm_up()
+    assert len(reader.deliveries) == len(first.deliveries), "the snapshot was rebuilt under a process reading it"
+
+
+def check_profile_header(paths, snapshot_dir):
+    """The profile header is ignored, and nothing traced, unless the app enables profiling."""
+    ipl = IPL(*paths, snapshot_dir=snapshot_dir)
+    for profiling in (False, True):
+        client = create_app(ipl=ipl, profiling=profiling).test_client()
+        response = client.get('/api/teams', headers={PROFILE_HEADER: '1'})
+        assert response.status_code == 200, f"/api/teams returned {response.status_code}"
+        assert (PROFILE_HEADER in response.headers) == profiling, f"profile header {'missing' if profiling else 'sent'} with profiling={profiling}"
+        assert ('Server-Timing' in response.headers) == profiling, f"Server-Timing {'missing' if profiling else 'sent'} with profiling={profiling}"
+        assert not tracemalloc.is_tracing(), "tracemalloc left running after the request"
+
+
+def check_load_memory(paths, snapshot_dir):
+    """Loading everything from the CSVs, then from the snapshot they leave, stays under LOAD_PEAK_MIB."""
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    for source in ('CSV', 'snapshot'):
+        with PeakMemory() as memory:
+            IPL(*paths, snapshot_dir=snapshot_dir).warm_up()
+        assert memory.mib <= LOAD_PEAK_MIB[source], f"loading from the {source} peaked at {memory.mib:.1f} MiB, over {LOAD_PEAK_MIB[source]}"
+
+
+def check_request_memory(paths, snapshot_dir):
+    """Every record request of the busiest players and of every team reads the shared tables in place,
+    so its peak stays under REQUEST_PEAK_MIB however many requests ran before."""
+    ipl = IPL(*paths, snapshot_dir=snapshot_dir)
+    ipl.warm_up()
+    busiest = ipl.batting_innings.player.value_counts().index[:10].tolist()
+    calls = [(ipl.batsmanRecord_API, player) for player in busiest] + [(ipl.bowlerRecord_API, player) for player in busiest]
+    calls += [(ipl.teamRecord_API, team) for team in ipl.allTeams_API()['teams']]
+    for method, name in calls * 2:
+        ipl.response_cache.clear() # every call computes its response
+        with PeakMemory() as memory:
+            method(name)
+        assert memory.mib <= REQUEST_PEAK_MIB, f"{method.__name__}({name!r}) peaked at {memory.mib:.1f} MiB, over {REQUEST_PEAK_MIB}"
+
+
+CHECKS = [check_append_version, check_empty_comparison, check_query_bowling, check_snapshot_rebuild, check_profile_header, check_load_memory, check_request_memory]
+
+
+if __name__ == '__main__':
+    folder = os.path.join(DATA_DIR, 'x1')
+    paths = [os.path.join(folder, 'IPL_Matches.csv'), os.path.join(folder, 'IPL_Ball_by_Ball.csv')]
+    if not all(map(os.path.exists, paths)):
+        generate(1, folder)
+
+    snapshot_dir = tempfile.mkdtemp(prefix='ipl-checks-')
+    try:
+        for check in CHECKS:
+            check(paths, snapshot_dir)
+            print(f"ok {check.__name__}")
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
@@ -0,0 +1,120 @@
+"""Differential check and benchmark of the query engines of IPL (see engines.py).
+
+Every team and player record is computed by each engine, over all seasons, the last one and a random
+few, and must serialize to the same JSON as the pandas engine's. Then every engine is timed on the same
+calls: median latency, and CPU time over wall time, the number of cores a call kept busy on average.
+Run from the dashboard folder:
+
+    python benchmarks/engines.py
+    python benchmarks/engines.py --scale 10 --engine duckdb
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+from ipl import IPL
+from engines import ENGINES
+from synthetic import generate
+
+DATA_DIR = os.path.join(HERE, 'data')
+
+
+def season_choices(ipl, rng):
+    seasons = ipl.allSeasons_API()['seasons']
+    return [['All'], [seasons[-1]], rng.sample(seasons, min(3, len(seasons)))]
+
+
+def calls(ipl, rng, sample):
+    """(method name, arguments) of every record compared, the players a random sample of `sample` if given."""
+    teams = ipl.allTeams_API()['teams']
+    players = ipl.allPlayers_API()['players']
+    if sample:
+        players = rng.sample(players, min(sample, len(players)))
+    seasons = season_choices(ipl, rng)
+    return ([('teamRecord_API', (team, chosen)) for team in teams for chosen in seasons]
+            + [('batsmanRecord_API', (player, chosen)) for player in players for chosen in seasons]
+            + [('bowlerRecord_API', (player, chosen)) for player in players for chosen in seasons]
+            + [('playerComparison_API', (*rng.sample(players, min(3, len(players))), chosen)) for chosen in seasons])
+
+
+def respond(ipl, name, args):
+    ipl.response_cache.clear() # every call computes its response
+    if name == 'playerComparison_API':
+        return getattr(ipl, name)(*args[:-1], seasons=args[-1])
+    return getattr(ipl, name)(*args)
+
+
+def differences(reference, other, checks):
+    bad = []
+    for name, args in checks:
+        expected = json.dumps(respond(reference, name, args), sort_keys=True, default=str)
+        if json.dumps(respond(other, name, args), sort_keys=True, default=str) != expected:
+            bad.append((name, args))
+    return bad
+
+
+def timed(ipl, checks, repeat):
+    """Median ms per call, and CPU seconds per wall second, over `repeat` rounds of `checks`."""
+    times, cpu, wall = {}, 0.0, 0.0
+    for _ in range(repeat):
+        for name, args in checks:
+            start, start_cpu = time.perf_counter(), time.process_time()
+            respond(ipl, name, args)
+            seconds = time.perf_counter() - start
+            cpu, wall = cpu + time.process_time() - start_cpu, wall + seconds
+            times.setdefault(name, []).append(seconds * 1000)
+    return {name: float(np.median(values)) for name, values in times.items()}, cpu / wall
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, help='synthetic data of this many times 2008-2022, instead of the real data')
+    parser.add_argument('--engine', action='append', choices=sorted(ENGINES), help='engines compared with pandas (repeatable, default all)')
+    parser.add_argument('--players', type=int, default=0, help='players sampled for the check (default every player)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed rounds of the benchmark calls')
+    parser.add_argument('--timed-players', type=int, default=50, help='players sampled for the benchmark')
+    args = parser.parse_args()
+
+    paths = ()
+    if args.scale:
+        folder = os.path.join(DATA_DIR, f'x{args.scale}')
+        paths = (os.path.join(folder, 'IPL_Matches.csv'), os.path.join(folder, 'IPL_Ball_by_Ball.csv'))
+        if not all(map(os.path.exists, paths)):
+            generate(args.scale, folder)
+
+    # A snapshot of its own, so synthetic data never replaces the snapshot the app serves
+    snapshot_dir = tempfile.mkdtemp(prefix='ipl-engines-')
+    try:
+        engines = {name: IPL(*paths, snapshot_dir=snapshot_dir, engine=name) for name in ['pandas'] + [name for name in args.engine or ENGINES if name != 'pandas']}
+        for ipl in engines.values():
+            ipl.warm_up()
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+    reference = engines['pandas']
+
+    checks = calls(reference, random.Random(0), args.players)
+    for name, ipl in engines.items():
+        if ipl is not reference:
+            bad = differences(reference, ipl, checks)
+            print(f"{name}: {len(checks) - len(bad)} of {len(checks)} responses identical to pandas")
+            for method, arguments in bad[:10]:
+                print(f"  differs: {method}{arguments}")
+            if bad:
+                sys.exit(1)
+
+    benchmark = calls(reference, random.Random(1), args.timed_players)
+    print(f"\n{os.cpu_count()} cores; CPU/wall is the average number of cores a call kept busy")
+    print(f"{'engine':<8} {'method':<22}{'median ms':>11}")
+    for name, ipl in engines.items():
+        medians, cores = timed(ipl, benchmark, args.repeat)
+        for method, median in medians.items():
+            print(f"{name:<8} {method:<22}{median:>11.2f}")
+        print(f"{name:<8} {'CPU/wall':<22}{cores:>11.2f}")
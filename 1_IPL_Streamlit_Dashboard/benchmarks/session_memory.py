@@ -0,0 +1,44 @@
+"""Resident memory of the Streamlit dashboard as browser sessions are added.
+
+Every session is a headless run of app.py (streamlit.testing) kept open in this process, as the
+sessions of one Streamlit server are. Run from the dashboard folder:
+
+    python benchmarks/session_memory.py --sessions 10
+"""
+import os
+import gc
+import argparse
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app.py')
+
+
+def rss_mib():
+    """Current resident set size of this process, in MiB (Linux)."""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--area', default='Batting', help='sidebar area every session opens')
+    args = parser.parse_args()
+
+    sessions = []
+    memory = [rss_mib()]
+    print(f"{'sessions':>8}{'RSS MiB':>10}{'added MiB':>11}")
+    print(f"{0:>8}{memory[0]:>10.1f}{'':>11}")
+    for n in range(1, args.sessions + 1):
+        session = AppTest.from_file(APP, default_timeout=300).run()
+        session.sidebar.selectbox[0].select(args.area).run()
+        assert not session.exception, [e.value for e in session.exception]
+        sessions.append(session)
+
+        gc.collect()
+        memory.append(rss_mib())
+        print(f"{n:>8}{memory[-1]:>10.1f}{memory[-1] - memory[-2]:>11.1f}")
+
+    if args.sessions > 1:
+        added = (memory[-1] - memory[1]) / (args.sessions - 1)
+        print(f"first session {memory[1] - memory[0]:.1f} MiB, every additional session {added:.1f} MiB on average")
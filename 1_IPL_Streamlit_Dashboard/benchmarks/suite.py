@@ -0,0 +1,210 @@
+"""Median and p95 time and peak memory of every public IPL method, on synthetic data at 1x, 10x and 100x.
+
+Data is generated once per scale into benchmarks/data (see synthetic.py) and every run is saved to
+benchmarks/results, so a run can be compared with an earlier one. Works offline. Run from the
+dashboard folder:
+
+    python benchmarks/suite.py --scale 1 --scale 10
+    python benchmarks/suite.py --scale 1 --compare benchmarks/results/<earlier run>.json
+"""
+import os
+import re
+import sys
+import gc
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+from ipl import IPL
+from synthetic import generate
+
+DATA_DIR = os.path.join(HERE, 'data')
+RESULTS_DIR = os.path.join(HERE, 'results')
+
+
+class PeakMemory:
+    """Peak memory a block adds to the process, in MiB.
+
+    The larger of the peak of Python and NumPy allocations (tracemalloc, exact even for small calls,
+    where freed memory is reused) and, on Linux, the rise of the resident set high-water mark, which
+    also sees the buffers Arrow allocates while loading.
+    """
+
+    def __enter__(self):
+        gc.collect()
+        self.proc = os.path.exists('/proc/self/clear_refs')
+        if self.proc:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5') # reset the high-water mark to the current resident set
+            self.start = self.status('VmRSS')
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.mib = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        if self.proc:
+            self.mib = max(self.mib, (self.status('VmHWM') - self.start) / 1024)
+
+    @staticmethod
+    def status(field):
+        with open('/proc/self/status') as f:
+            return int(re.search(rf'{field}:\s+(\d+)', f.read()).group(1))
+
+
+def measure(call, repeat):
+    """Time `call` `repeat` times, and its peak memory on one more run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - start) * 1000)
+    with PeakMemory() as memory:
+        call()
+    return {
+        'runs': repeat,
+        'median_ms': round(float(np.median(times)), 3),
+        'p95_ms': round(float(np.percentile(times, 95)), 3),
+        'peak_mib': round(memory.mib, 1),
+    }
+
+
+def cases(ipl, sample):
+    """(name, call) of every public IPL method, each call on the next team or player of a random sample."""
+    rng = random.Random(0)
+    teams = ipl.allTeams_API()['teams']
+    players = ipl.allPlayers_API()['players']
+    players = rng.sample(players, min(sample, len(players)))
+    last_season = [ipl.allSeasons_API()['seasons'][-1]]
+    cycle = lambda items: (items[n % len(items)] for n in range(10**9))
+    team, player = cycle(teams), cycle(players)
+
+    def uncached(method):
+        # Every call computes its response, instead of timing the response cache
+        def call(*args, **kwargs):
+            ipl.response_cache.clear()
+            return method(*args, **kwargs)
+        return call
+
+    return [
+        ('allSeasons_API', lambda: ipl.allSeasons_API()),
+        ('allTeams_API', lambda: ipl.allTeams_API()),
+        ('allPlayers_API', lambda: ipl.allPlayers_API()),
+        ('teamPlayers_API', lambda: ipl.teamPlayers_API(next(team))),
+        ('teamRecord_API', lambda: uncached(ipl.teamRecord_API)(next(team))),
+        ('teamRecord_API last season', lambda: uncached(ipl.teamRecord_API)(next(team), seasons=last_season)),
+        ('batsmanRecord_API', lambda: uncached(ipl.batsmanRecord_API)(next(player))),
+        ('bowlerRecord_API', lambda: uncached(ipl.bowlerRecord_API)(next(player))),
+        ('playerComparison_API', lambda: ipl.playerComparison_API(next(player), next(player), next(player))),
+        ('leaderboard_API batting', lambda: uncached(ipl.leaderboard_API)('batting')),
+        ('leaderboard_API bowling last season', lambda: uncached(ipl.leaderboard_API)('bowling', seasons=last_season)),
+        ('leaderboard_API cached', lambda: ipl.leaderboard_API('batting', min_innings=10)),
+        ('query_API batting by batter', lambda: ipl.query_API('batting', group_by=['batter'])),
+        ('query_API death overs last season', lambda: ipl.query_API('batting', {'phase': 'death', 'season': last_season}, ['batter'])),
+        ('query_API team playoffs', lambda: ipl.query_API('team', {'stage': 'playoff'}, ['batting_team', 'season'])),
+    ]
+
+
+def append_case(ipl):
+    """append_matches of a copy of the last season, under new match IDs."""
+    season = ipl.allSeasons_API()['seasons'][-1]
+    matches = ipl.matches[ipl.matches['Season'] == season].copy()
+    # ipl.balls is released once the deliveries are built, so the season's rows are read from the file
+    balls = pd.read_csv(ipl.ipl_balls)
+    balls = balls[balls['ID'].isin(matches['ID'])].copy()
+    offset = int(ipl.matches['ID'].max())
+    matches['ID'] += offset
+    balls['ID'] += offset
+    matches['Season'] = matches['Season'].astype(str)
+    return ('append_matches last season', lambda: ipl.append_matches(matches, balls))
+
+
+def run_scale(scale, repeat, load_repeat, sample):
+    folder = os.path.join(DATA_DIR, f'x{scale}')
+    paths = [os.path.join(folder, 'IPL_Matches.csv'), os.path.join(folder, 'IPL_Ball_by_Ball.csv')]
+    if not all(map(os.path.exists, paths)):
+        print(f"generating {scale}x data into {folder}", flush=True)
+        generate(scale, folder)
+
+    results = {}
+    snapshot_dir = tempfile.mkdtemp(prefix='ipl-benchmark-')
+    try:
+        # IPL() itself reads nothing, so loads are timed to a full warm_up and to a first response
+        def from_csv():
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            IPL(*paths, snapshot_dir=snapshot_dir).warm_up()
+        results['IPL() from CSV'] = measure(from_csv, load_repeat)
+        results['IPL() from snapshot'] = measure(lambda: IPL(*paths, snapshot_dir=snapshot_dir).warm_up(), load_repeat)
+        results['IPL() to first allSeasons_API'] = measure(lambda: IPL(*paths, snapshot_dir=snapshot_dir).allSeasons_API(), load_repeat)
+        def first_record():
+            ipl = IPL(*paths, snapshot_dir=snapshot_dir)
+            ipl.batsmanRecord_API(ipl.allPlayers_API()['players'][0])
+        results['IPL() to first batsmanRecord_API'] = measure(first_record, load_repeat)
+        ipl = IPL(*paths, snapshot_dir=snapshot_dir)
+        ipl.warm_up()
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    for name, call in cases(ipl, sample) + [append_case(ipl)]:
+        results[name] = measure(call, load_repeat if name.startswith('append') else repeat)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def report(run, previous=None):
+    print(f"{'scale':>5} {'method':<38}{'median ms':>11}{'p95 ms':>11}{'peak MiB':>10}" + (f"{'median x':>10}{'peak x':>8}" if previous else ''))
+    for scale, results in run['results'].items():
+        for name, result in results.items():
+            line = f"{scale + 'x':>5} {name:<38}{result['median_ms']:>11.2f}{result['p95_ms']:>11.2f}{result['peak_mib']:>10.1f}"
+            before = (previous or {}).get('results', {}).get(scale, {}).get(name)
+            if before:
+                ratio = lambda key: f"{result[key] / before[key]:.2f}" if before[key] else '-'
+                line += f"{ratio('median_ms'):>10}{ratio('peak_mib'):>8}"
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, action='append', help='data size, a multiple of 2008-2022 (repeatable, default 1)')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs of every method')
+    parser.add_argument('--load-repeat', type=int, default=3, help='timed runs of loading and appending')
+    parser.add_argument('--players', type=int, default=100, help='players sampled for the player methods')
+    parser.add_argument('--compare', help='results file of an earlier run to compare with')
+    parser.add_argument('--label', default='', help='added to the results file name')
+    args = parser.parse_args()
+
+    run = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'results': {str(scale): run_scale(scale, args.repeat, args.load_repeat, args.players) for scale in args.scale or [1]},
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + (f'-{args.label}' if args.label else '') + '.json')
+    with open(path, 'w') as f:
+        json.dump(run, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    report(run, previous)
+    print(f"saved {path}")
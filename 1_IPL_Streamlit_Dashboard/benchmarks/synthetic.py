@@ -0,0 +1,276 @@
+"""Synthetic IPL matches and ball-by-ball files, at a multiple of the size of the 2008-2022 data.
+
+Seasons follow the shape of the real tournament: the same teams and matches per season, squads that
+carry over between seasons with players released, traded and retiring, and the real rates of runs,
+extras and dismissals per delivery. Scale 10 plays the 15 seasons ten times over, so there are ten
+times the seasons, matches, players and deliveries, but careers, innings and seasons keep their real
+sizes. Run from the dashboard folder:
+
+    python benchmarks/synthetic.py --scale 10 --out benchmarks/data/x10
+"""
+import os
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv
+
+# Teams and matches of the seasons 2008 to 2022, repeated for larger scales
+SEASON_TEAMS = [8, 8, 8, 10, 9, 9, 8, 8, 8, 8, 8, 8, 8, 8, 10]
+SEASON_MATCHES = [58, 57, 60, 73, 74, 76, 60, 59, 60, 59, 60, 60, 60, 60, 74]
+PLAYOFFS = ['Qualifier 1', 'Eliminator', 'Qualifier 2', 'Final']
+FIRST_SEASON = 2008
+FIRST_ID = 335982
+
+TEAMS = {
+    'Chennai Super Kings': ('Chennai', 'MA Chidambaram Stadium, Chepauk, Chennai'),
+    'Mumbai Indians': ('Mumbai', 'Wankhede Stadium, Mumbai'),
+    'Royal Challengers Bangalore': ('Bangalore', 'M Chinnaswamy Stadium'),
+    'Kolkata Knight Riders': ('Kolkata', 'Eden Gardens'),
+    'Rajasthan Royals': ('Jaipur', 'Sawai Mansingh Stadium'),
+    'Punjab Kings': ('Chandigarh', 'Punjab Cricket Association Stadium, Mohali'),
+    'Delhi Capitals': ('Delhi', 'Arun Jaitley Stadium'),
+    'Sunrisers Hyderabad': ('Hyderabad', 'Rajiv Gandhi International Stadium, Uppal'),
+    'Gujarat Titans': ('Ahmedabad', 'Narendra Modi Stadium, Ahmedabad'),
+    'Lucknow Super Giants': ('Lucknow', 'Bharat Ratna Shri Atal Bihari Vajpayee Ekana Cricket Stadium'),
+}
+UMPIRES = [f'Umpire {n}' for n in range(1, 41)]
+
+SQUAD = 20 # players on a team's books in a season
+RELEASED = 0.25 # share of a squad released to the auction every season
+CAREER_SEASONS = 5 # mean length of a career
+
+# Outcome rates of a delivery
+EXTRA_TYPES = [None, 'wides', 'legbyes', 'noballs', 'byes', 'penalty']
+EXTRA_P = [0.9298, 0.0298, 0.0196, 0.0101, 0.0096, 0.0011]
+EXTRA_RUNS = np.array([0, 1, 1, 1, 1, 5])
+RUNS = np.array([0, 1, 2, 3, 4, 6])
+RUNS_P = [0.378, 0.372, 0.066, 0.004, 0.118, 0.062]
+WICKET_P = 0.049
+DISMISSALS = ['caught', 'bowled', 'run out', 'lbw', 'caught and bowled', 'stumped', 'retired hurt', 'hit wicket']
+DISMISSALS_P = [0.604, 0.168, 0.086, 0.076, 0.026, 0.025, 0.005, 0.010]
+FIELDED = np.array([True, False, True, False, False, True, False, False]) # dismissals credited to a fielder
+RUN_OUT = DISMISSALS.index('run out')
+
+MAX_DELIVERIES = 160 # per innings: 120 legal balls and the extras bowled among them
+
+
+class Squads:
+    """Every team's players, carried from season to season."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.teams = {team: [] for team in TEAMS}
+        self.seasons_left = []
+        self.selection = [] # how likely a player makes the playing XI
+        self.batting = [] # where a player bats, low is early
+        self.names = []
+
+    def debut(self):
+        self.names.append(f'Player {len(self.names) + 1}')
+        self.seasons_left.append(self.rng.geometric(1 / CAREER_SEASONS))
+        self.selection.append(self.rng.exponential())
+        self.batting.append(self.rng.random())
+        return len(self.seasons_left) - 1
+
+    def new_season(self, teams):
+        auction = []
+        for team in teams:
+            kept = []
+            for player in self.teams[team]:
+                self.seasons_left[player] -= 1
+                if self.seasons_left[player] <= 0:
+                    continue
+                (auction if self.rng.random() < RELEASED else kept).append(player)
+            self.teams[team] = kept
+        self.rng.shuffle(auction)
+        for team in teams:
+            while len(self.teams[team]) < SQUAD:
+                self.teams[team].append(auction.pop() if auction else self.debut())
+
+    def playing_xi(self, team):
+        """Eleven players of the team's squad, in batting order."""
+        squad = np.array(self.teams[team])
+        weights = np.array(self.selection)[squad] + 0.1
+        xi = self.rng.choice(squad, 11, replace=False, p=weights / weights.sum())
+        return xi[np.argsort(np.array(self.batting)[xi])]
+
+
+def fixtures(rng, teams, count):
+    """`count` league pairings of the season: home and away round robins, as many as fit."""
+    pairs = list(itertools.permutations(teams, 2))
+    rng.shuffle(pairs)
+    return [pairs[n % len(pairs)] for n in range(count)]
+
+
+def play_innings(rng, batters, bowlers, target=None):
+    """Ball-by-ball of one innings per row of `batters` (batting order) against `bowlers` (fielding XI).
+
+    Every innings is drawn as MAX_DELIVERIES deliveries at once and cut where 20 overs are bowled, the
+    10th wicket falls or the target is passed. Strike changes on odd runs and at the end of an over;
+    a new batter takes the crease end of the one dismissed.
+    """
+    shape = (len(batters), MAX_DELIVERIES)
+    extra = rng.choice(len(EXTRA_TYPES), size=shape, p=EXTRA_P)
+    runs = rng.choice(RUNS, size=shape, p=RUNS_P)
+    batsman_run = np.where((extra == 0) | (extra == 3), runs, 0)
+    extras_run = np.where((extra == 2) & (runs >= 4), 4, EXTRA_RUNS[extra]) # the odd leg-bye to the boundary
+    wicket = (rng.random(shape) < WICKET_P) & (extra != 3)
+    kind = rng.choice(len(DISMISSALS), size=shape, p=DISMISSALS_P)
+    batsman_run = np.where(wicket & (kind != RUN_OUT), 0, batsman_run)
+    total_run = batsman_run + extras_run
+
+    legal = (extra != 1) & (extra != 3)
+    legal_before = np.cumsum(legal, axis=1) - legal
+    wickets_before = np.cumsum(wicket, axis=1) - wicket
+    played = (legal_before < 120) & (wickets_before < 10)
+    if target is not None:
+        played &= (np.cumsum(total_run, axis=1) - total_run) <= target[:, None]
+
+    overs = legal_before // 6
+    position = np.arange(MAX_DELIVERIES)
+    over_start = np.maximum.accumulate(np.where(np.diff(overs, axis=1, prepend=-1) != 0, position, 0), axis=1)
+    ballnumber = position - over_start + 1
+
+    ran = batsman_run + np.where((extra == 2) | (extra == 4), extras_run, 0)
+    swap = (ran % 2 == 1) ^ (legal & (legal_before % 6 == 5))
+    striker_end = (np.cumsum(swap, axis=1) - swap) % 2
+    out_end = np.where(wicket & (kind == RUN_OUT) & (rng.random(shape) < 0.4), 1 - striker_end, striker_end)
+
+    # Batting order position at each end: the opener, replaced by the next batter after each dismissal there
+    at_end = []
+    for end in (0, 1):
+        arrivals = np.where(wicket & (out_end == end), 2 + wickets_before, -1)
+        arrivals = np.maximum.accumulate(np.pad(arrivals[:, :-1], ((0, 0), (1, 0)), constant_values=-1), axis=1)
+        at_end.append(np.minimum(np.where(arrivals < 0, end, arrivals), 10))
+
+    row = np.arange(len(batters))[:, None]
+    striker = np.where(striker_end == 0, at_end[0], at_end[1])
+    non_striker = np.where(striker_end == 0, at_end[1], at_end[0])
+    out = np.where(out_end == 0, at_end[0], at_end[1])
+    fielder = bowlers[row, rng.integers(0, 11, size=shape)]
+    fielded = wicket & FIELDED[kind]
+
+    innings, delivery = np.nonzero(played)
+    pick = lambda values: values[innings, delivery]
+    deliveries = {
+        'row': innings,
+        'overs': pick(overs), 'ballnumber': pick(ballnumber),
+        'batter': pick(batters[row, striker]), 'bowler': pick(bowlers[row, 6 + overs % 5]), 'non-striker': pick(batters[row, non_striker]),
+        'extra_type': pick(extra), 'batsman_run': pick(batsman_run), 'extras_run': pick(extras_run), 'total_run': pick(total_run),
+        'non_boundary': pick((batsman_run == 4) & (rng.random(shape) < 0.01)).astype(int),
+        'isWicketDelivery': pick(wicket).astype(int), 'player_out': pick(np.where(wicket, batters[row, out], -1)),
+        'kind': pick(np.where(wicket, kind, -1)), 'fielders_involved': pick(np.where(fielded, fielder, -1)),
+    }
+    totals = (total_run * played).sum(axis=1)
+    wickets = (wicket * played).sum(axis=1)
+    return deliveries, totals, wickets
+
+
+def labels(codes, names):
+    """Strings of `codes` into `names`, null where the code is -1."""
+    return pa.array(np.append(np.array(names, dtype=object), None)[codes], pa.string())
+
+
+def season(rng, squads, season_number, first_id):
+    """Matches and ball-by-ball of one season, as Arrow tables."""
+    teams = list(TEAMS)[:SEASON_TEAMS[season_number % len(SEASON_TEAMS)]]
+    count = SEASON_MATCHES[season_number % len(SEASON_MATCHES)]
+    year = FIRST_SEASON + season_number
+    squads.new_season(teams)
+
+    pairs = fixtures(rng, teams, count - len(PLAYOFFS)) + [tuple(rng.choice(teams, 2, replace=False)) for _ in PLAYOFFS]
+    ids = np.arange(first_id, first_id + count)
+    team1, team2 = (np.array(side) for side in zip(*pairs))
+    xi1 = np.array([squads.playing_xi(team) for team in team1])
+    xi2 = np.array([squads.playing_xi(team) for team in team2])
+
+    toss_winner = np.where(rng.random(count) < 0.5, team1, team2)
+    toss_decision = np.where(rng.random(count) < 0.6, 'field', 'bat')
+    team1_bats = (toss_winner == team1) == (toss_decision == 'bat')
+    first_team, second_team = np.where(team1_bats, team1, team2), np.where(team1_bats, team2, team1)
+    first_xi, second_xi = np.where(team1_bats[:, None], xi1, xi2), np.where(team1_bats[:, None], xi2, xi1)
+
+    first, first_totals, _ = play_innings(rng, first_xi, second_xi)
+    second, second_totals, second_wickets = play_innings(rng, second_xi, first_xi, target=first_totals)
+
+    chased, tied = second_totals > first_totals, second_totals == first_totals
+    winner = np.where(chased, second_team, first_team)
+    winner = np.where(tied, np.where(rng.random(count) < 0.5, team1, team2), winner)
+    won_by = np.where(tied, 'SuperOver', np.where(chased, 'Wickets', 'Runs'))
+    margin = np.where(tied, np.nan, np.where(chased, 10 - second_wickets, first_totals - second_totals))
+
+    balls = pd.DataFrame({**first, 'innings': 1, 'team': first_team[first['row']]})
+    balls = pd.concat([balls, pd.DataFrame({**second, 'innings': 2, 'team': second_team[second['row']]})], ignore_index=True)
+    balls['ID'] = ids[balls['row']]
+    balls = balls.sort_values(['row', 'innings'], kind='stable', ignore_index=True)
+
+    # Player of the match: the top scorer of the winners
+    winners = balls[balls['team'].to_numpy() == winner[balls['row']]]
+    scores = winners.groupby(['row', 'batter'])['batsman_run'].sum().sort_values(kind='stable').groupby(level='row').tail(1)
+    player_of_match = np.full(count, -1)
+    player_of_match[scores.index.get_level_values('row')] = scores.index.get_level_values('batter')
+
+    player_names = np.array(squads.names, dtype=object)
+    cities, venues = zip(*(TEAMS[team] for team in team1))
+    umpires = np.array([rng.choice(len(UMPIRES), 2, replace=False) for _ in range(count)])
+    dates = pd.Timestamp(f'{year}-03-26') + pd.to_timedelta(np.arange(count), unit='D')
+    xi_repr = lambda xi: [str([player_names[code] for code in row]) for row in xi]
+
+    matches = pa.table({
+        'ID': ids, 'City': list(cities), 'Date': dates.strftime('%Y-%m-%d').tolist(), 'Season': [str(year)] * count,
+        'MatchNumber': [str(n) for n in range(1, count - len(PLAYOFFS) + 1)] + PLAYOFFS,
+        'Team1': team1.tolist(), 'Team2': team2.tolist(), 'Venue': list(venues),
+        'TossWinner': toss_winner.tolist(), 'TossDecision': toss_decision.tolist(),
+        'SuperOver': np.where(tied, 'Y', 'N').tolist(), 'WinningTeam': winner.tolist(), 'WonBy': won_by.tolist(),
+        'Margin': pa.array(margin, from_pandas=True), 'method': pa.nulls(count, pa.string()),
+        'Player_of_Match': labels(player_of_match, player_names),
+        'Team1Players': xi_repr(xi1), 'Team2Players': xi_repr(xi2),
+        'Umpire1': labels(umpires[:, 0], UMPIRES), 'Umpire2': labels(umpires[:, 1], UMPIRES),
+    })
+    balls = pa.table({
+        'ID': balls['ID'].to_numpy(), 'innings': balls['innings'].to_numpy(), 'overs': balls['overs'].to_numpy(), 'ballnumber': balls['ballnumber'].to_numpy(),
+        'batter': labels(balls['batter'].to_numpy(), player_names), 'bowler': labels(balls['bowler'].to_numpy(), player_names),
+        'non-striker': labels(balls['non-striker'].to_numpy(), player_names),
+        'extra_type': labels(balls['extra_type'].to_numpy() - 1, EXTRA_TYPES[1:]),
+        **{column: balls[column].to_numpy() for column in ['batsman_run', 'extras_run', 'total_run', 'non_boundary', 'isWicketDelivery']},
+        'player_out': labels(balls['player_out'].to_numpy(), player_names), 'kind': labels(balls['kind'].to_numpy(), DISMISSALS),
+        'fielders_involved': labels(balls['fielders_involved'].to_numpy(), player_names), 'BattingTeam': balls['team'].tolist(),
+    })
+    return matches, balls
+
+
+def generate(scale, out, seed=0):
+    """Write the matches and ball-by-ball CSVs of `scale` times the 2008-2022 seasons into `out`."""
+    os.makedirs(out, exist_ok=True)
+    matches_path, balls_path = os.path.join(out, 'IPL_Matches.csv'), os.path.join(out, 'IPL_Ball_by_Ball.csv')
+    rng = np.random.default_rng(seed)
+    squads = Squads(rng)
+    options = pa.csv.WriteOptions(quoting_style='needed')
+
+    matches, balls_writer, first_id = [], None, FIRST_ID
+    for season_number in range(len(SEASON_TEAMS) * scale):
+        season_matches, season_balls = season(rng, squads, season_number, first_id)
+        first_id += season_matches.num_rows
+        matches.append(season_matches)
+        # Deliveries are written season by season, so memory stays flat at any scale
+        balls_writer = balls_writer or pa.csv.CSVWriter(balls_path + '.part', season_balls.schema, write_options=options)
+        balls_writer.write_table(season_balls)
+    balls_writer.close()
+
+    pa.csv.write_csv(pa.concat_tables(matches), matches_path + '.part', write_options=options)
+    os.replace(balls_path + '.part', balls_path)
+    os.replace(matches_path + '.part', matches_path)
+    return matches_path, balls_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1, help='multiple of the 15 seasons of 2008-2022')
+    parser.add_argument('--out', help='output folder, benchmarks/data/x<scale> by default')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate(args.scale, args.out or os.path.join(os.path.dirname(__file__), 'data', f'x{args.scale}'), args.seed)
+    print(*paths, sep='\n')
@@ -0,0 +1,80 @@
+import numpy as np
+
+# Dimensions with at most this many values keep one packed bitmap per value; the others, such as
+# players, keep the rows of each value and make their bitmap when a filter uses it
+DENSE_VALUES = 64
+
+
+class BitmapIndex:
+    """Rows of a fact table per value of each of its dimensions, so a filter on any combination of
+    dimensions is a few bitwise ANDs and ORs of packed bitmaps (one bit per row), never a scan.
+
+    Every dimension is given as an integer code per row and the sorted values the codes index;
+    -1 is a missing value, in no bitmap.
+    """
+
+    def __init__(self, dimensions):
+        # dimensions: {name: (codes, values)}
+        self.size = len(next(iter(dimensions.values()))[0]) if dimensions else 0
+        self.codes = {name: np.asarray(codes) for name, (codes, _) in dimensions.items()}
+        self.values = {name: np.asarray(values) for name, (_, values) in dimensions.items()}
+        self.value_codes = {name: {value: code for code, value in enumerate(values.tolist())} for name, values in self.values.items()}
+
+        self.bitmaps, self.rows = {}, {}
+        for name, codes in self.codes.items():
+            if len(self.values[name]) <= DENSE_VALUES:
+                bitmaps = [np.packbits(codes == code) for code in range(len(self.values[name]))]
+                self.bitmaps[name] = np.stack(bitmaps) if bitmaps else np.zeros((0, (self.size + 7) // 8), dtype=np.uint8)
+            else:
+                order = np.argsort(codes, kind='stable').astype(np.int32)
+                self.rows[name] = order, np.searchsorted(codes[order], np.arange(len(self.values[name]) + 1))
+
+    def code(self, dimension, value):
+        """Code of `value` in `dimension`, None if it never occurs; numbers may be given as strings."""
+        codes = self.value_codes[dimension]
+        if value not in codes and isinstance(value, str) and self.values[dimension].dtype.kind in 'iu' and value.lstrip('-').isdigit():
+            value = int(value)
+        return codes.get(value)
+
+    def bitmap(self, dimension, values):
+        """Packed bitmap of the rows whose `dimension` is any of `values`."""
+        codes = [code for code in (self.code(dimension, value) for value in values) if code is not None]
+        if dimension in self.bitmaps:
+            return np.bitwise_or.reduce(self.bitmaps[dimension][codes], axis=0) if codes else np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        order, starts = self.rows[dimension]
+        mask = np.zeros(self.size, dtype=bool)
+        for code in codes:
+            mask[order[starts[code]:starts[code + 1]]] = True
+        return np.packbits(mask)
+
+    def select(self, filters):
+        """Rows matching every {dimension: values} filter, ascending."""
+        bits = None
+        for dimension, values in filters.items():
+            bitmap = self.bitmap(dimension, values)
+            bits = bitmap if bits is None else np.bitwise_and(bits, bitmap, out=bits)
+        if bits is None:
+            return np.arange(self.size)
+        return np.flatnonzero(np.unpackbits(bits, count=self.size))
+
+    def keys(self, dimensions, rows):
+        """Group key of every row of `rows` by the values of `dimensions`; indexes with the same values
+        of these dimensions give the same keys, so their groups can be matched."""
+        key = np.zeros(len(rows), dtype=np.int64)
+        for dimension in dimensions:
+            # Shifted by one, so missing values (-1) form a group of their own
+            key = key * (len(self.values[dimension]) + 1) + self.codes[dimension][rows] + 1
+        return key
+
+    def groups(self, dimensions, *keys):
+        """Group number of every key of each of the `keys` arrays, and the values of each group."""
+        unique, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        columns = {}
+        for dimension in reversed(dimensions):
+            radix = len(self.values[dimension]) + 1
+            codes = unique % radix - 1
+            values = self.values[dimension].take(codes.clip(min=0)).astype(object)
+            values[codes < 0] = None
+            columns[dimension] = values
+            unique = unique // radix
+        return np.split(inverse.reshape(-1), np.cumsum([len(key) for key in keys[:-1]])), {dimension: columns[dimension] for dimension in dimensions}
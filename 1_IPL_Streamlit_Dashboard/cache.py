@@ -0,0 +1,61 @@
+import sys
+import threading
+from collections import OrderedDict
+from profiling import cache_lookup
+
+
+def estimate_size(obj):
+    """Rough deep size in bytes of a JSON-like response (dicts, lists, strings and numbers)."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key) + estimate_size(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(estimate_size(item) for item in obj)
+    return size
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by entry count and estimated bytes.
+
+    Cached values are shared between callers, so they must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # key -> (value, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, should_cache=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                cache_lookup(hit=True)
+                return self.entries[key][0]
+            self.misses += 1
+        cache_lookup(hit=False)
+
+        # Computed outside the lock, so a slow record never blocks hits on other keys
+        value = compute()
+        size = estimate_size(value)
+        with self.lock:
+            if key not in self.entries and size <= self.max_bytes and (should_cache is None or should_cache(value)):
+                self.entries[key] = (value, size)
+                self.bytes += size
+                while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                    _, (_, evicted_size) = self.entries.popitem(last=False)
+                    self.bytes -= evicted_size
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
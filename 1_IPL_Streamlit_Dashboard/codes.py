@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+# Integer type of the codes of each dictionary
+CODE_DTYPES = {'teams': np.int16, 'players': np.int32, 'seasons': np.int16, 'venues': np.int16, 'cities': np.int16}
+
+
+def sorted_names(*columns):
+    names = pd.unique(np.concatenate([np.asarray(column, dtype=object) for column in columns]))
+    return np.sort(np.array([name for name in names if isinstance(name, str)], dtype=object))
+
+
+class Codes:
+    """Sorted names of every team, player, season, venue and city, shared by all the integer-coded tables.
+
+    The code of a name is its position in its array, and -1 stands for a missing name, as in
+    categorical codes. Codes only change when new names are added, see extended and recode.
+    """
+
+    def __init__(self, teams, players, seasons, venues, cities):
+        self.teams, self.players, self.seasons, self.venues, self.cities = teams, players, seasons, venues, cities
+
+    @classmethod
+    def of(cls, matches, balls, squad_players):
+        """Codes of every name in the matches and ball-by-ball tables; squad_players are the names in the
+        playing XIs, see squads.parse_squads."""
+        categories = lambda *columns: [balls[column].cat.categories if hasattr(balls[column], 'cat') else balls[column] for column in columns]
+        return cls(
+            teams=sorted_names(matches['Team1'], matches['Team2'], *categories('BattingTeam')),
+            players=sorted_names(matches['Player_of_Match'], squad_players, *categories('batter', 'bowler', 'non-striker', 'player_out')),
+            seasons=sorted_names(matches['Season']),
+            venues=sorted_names(matches['Venue']),
+            cities=sorted_names(matches['City']),
+        )
+
+    def extended(self, matches, balls, squad_players):
+        """Codes of these names and of those of the new `matches` and `balls`."""
+        new = Codes.of(matches, balls, squad_players)
+        return Codes(*(sorted_names(getattr(self, kind), getattr(new, kind)) for kind in CODE_DTYPES))
+
+    def encode(self, kind, names):
+        """Codes of `names` in the `kind` dictionary, -1 where missing or unknown."""
+        return pd.Categorical(names, categories=getattr(self, kind)).codes.astype(CODE_DTYPES[kind])
+
+    def decode(self, kind, codes):
+        """Categorical of the names of `codes`."""
+        return pd.Categorical.from_codes(codes, categories=getattr(self, kind))
+
+    def names(self, kind, codes):
+        """Object array of the names of `codes`, which must not be missing."""
+        return getattr(self, kind).take(codes)
+
+    def recode(self, old, kind, codes):
+        """`codes` of the `old` Codes, as codes of these ones, which hold every name of the old ones."""
+        old_names, names = getattr(old, kind), getattr(self, kind)
+        if len(old_names) == len(names):
+            return codes
+        mapping = np.searchsorted(names, old_names).astype(CODE_DTYPES[kind])
+        return np.where(codes >= 0, mapping.take(codes), -1).astype(CODE_DTYPES[kind])
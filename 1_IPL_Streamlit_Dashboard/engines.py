@@ -0,0 +1,150 @@
+import threading
+import numpy as np
+import pandas as pd
+from profiling import stage
+
+try:
+    import duckdb
+except ImportError: # only the pandas engine is available then
+    duckdb = None
+
+
+class PandasEngine:
+    """The record aggregations of IPL itself: slices of the entity-sorted tables reduced with NumPy, in the request's thread."""
+
+    name = 'pandas'
+
+    def __init__(self, ipl):
+        self.ipl = ipl
+
+    def batting(self, players, seasons):
+        return self.ipl.batting_frames(players, seasons)
+
+    def bowling(self, players, seasons):
+        return self.ipl.bowling_frames(players, seasons)
+
+    def team(self, team, seasons):
+        return self.ipl.team_sums(team, seasons)
+
+
+class DuckDBEngine:
+    """The same aggregations as SQL, run by an embedded DuckDB over its own columnar copy of the
+    per-innings and per-match tables, so one query can use every core.
+
+    Each thread queries through its own cursor; DuckDB runs concurrent queries on the shared database.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, ipl):
+        if duckdb is None:
+            raise ValueError("The duckdb engine needs the duckdb package (pip install duckdb)")
+        from ipl import BATTING_COUNTERS, BOWLING_COUNTERS, TEAM_COUNTERS # ipl imports this module
+        self.batting_counters, self.bowling_counters, self.team_counters = BATTING_COUNTERS, BOWLING_COUNTERS, TEAM_COUNTERS
+        self.connection = duckdb.connect(':memory:')
+        for table in ('batting_innings', 'bowling_innings', 'team_matches'):
+            frame = getattr(ipl, table)
+            # Categoricals become plain strings, so every comparison and ORDER BY is on the names
+            frame = frame.assign(**{column: frame[column].astype(object) for column in frame.columns if isinstance(frame[column].dtype, pd.CategoricalDtype)})
+            self.connection.register('frame', frame)
+            self.connection.execute(f"CREATE TABLE {table} AS SELECT * FROM frame")
+            self.connection.unregister('frame')
+        self.local = threading.local()
+
+    def cursor(self):
+        if not hasattr(self.local, 'cursor'):
+            self.local.cursor = self.connection.cursor()
+        return self.local.cursor
+
+    def query(self, sql, parameters, index):
+        frame = self.cursor().execute(sql, parameters).df()
+        return frame.set_index(index) if len(index) > 1 else frame.set_index(index[0])
+
+    @staticmethod
+    def where(entity, seasons):
+        """Row filter of the entities and seasons asked for, and its parameters."""
+        if 'All' in seasons:
+            return f"list_contains($entities, {entity})", {}
+        return f"list_contains($entities, {entity}) AND list_contains($seasons, Season)", {'seasons': sorted(set(seasons))}
+
+    def batting(self, players, seasons):
+        """The counter frames of IPL.batting_frames."""
+        where, parameters = self.where('player', seasons)
+        parameters['entities'] = list(dict.fromkeys(players))
+        sums = ', '.join(f"sum({column})::BIGINT AS {column}" for column in self.batting_counters)
+        # As batting_key: innings, then runs, then not out
+        best = "max(innings::BIGINT * 131072 + runs::BIGINT * 2 + 1 - out) AS best"
+        counters = lambda outs, rows, by: f"""
+            SELECT {', '.join(by)}, {sums}, sum({outs})::BIGINT AS outs, {best}
+            FROM ({rows}) GROUP BY ALL ORDER BY {', '.join(by)}"""
+        rows = f"SELECT * FROM batting_innings WHERE {where}"
+        faced = f"{rows} AND deliveries > 0"
+        before_last = f"""
+            SELECT rows.* FROM ({faced}) AS rows
+            JOIN (SELECT player, max(ID) AS last FROM ({faced}) GROUP BY player) USING (player)
+            WHERE ID < last"""
+
+        with stage('duckdb.batting') as step:
+            frames = [
+                self.query(counters('dismissed', rows, ['player']), parameters, ['player']),
+                self.query(counters('out', before_last, ['player']), parameters, ['player']),
+                self.query(counters('out', faced, ['player', 'BowlingTeam']), parameters, ['player', 'BowlingTeam']),
+                self.query(counters('out', faced, ['player', 'Season']), parameters, ['player', 'Season']),
+            ]
+            for frame in frames:
+                best = frame.pop('best').to_numpy(np.int64)
+                frame['highest'] = best >> 1 & 0xFFFF
+                frame['highest_out'] = 1 - (best & 1)
+            step.built(*frames)
+        return frames
+
+    def bowling(self, players, seasons):
+        """The counter frames of IPL.bowling_frames."""
+        where, parameters = self.where('player', seasons)
+        parameters['entities'] = list(dict.fromkeys(players))
+        sums = ', '.join(f"sum({column})::BIGINT AS {column}" for column in self.bowling_counters)
+        # As bowling_key: most wickets, then fewest runs
+        best = "max(wickets::BIGINT * 65536 + 65535 - runs) AS best"
+        counters = lambda rows, by: f"""
+            SELECT {', '.join(by)}, {sums}, {best}
+            FROM ({rows}) GROUP BY ALL ORDER BY {', '.join(by)}"""
+        rows = f"SELECT * FROM bowling_innings WHERE {where}"
+        before_last = f"""
+            SELECT rows.* FROM ({rows}) AS rows
+            JOIN (SELECT player, max(ID) AS last FROM ({rows}) GROUP BY player) USING (player)
+            WHERE ID < last"""
+
+        with stage('duckdb.bowling') as step:
+            frames = [
+                self.query(counters(rows, ['player']), parameters, ['player']),
+                self.query(counters(before_last, ['player']), parameters, ['player']),
+                self.query(counters(rows, ['player', 'BattingTeam']), parameters, ['player', 'BattingTeam']),
+                self.query(counters(rows, ['player', 'Season']), parameters, ['player', 'Season']),
+            ]
+            for frame in frames:
+                best = frame.pop('best').to_numpy(np.int64)
+                frame['best_wickets'] = best >> 16
+                frame['best_runs'] = 0xFFFF - (best & 0xFFFF)
+            step.built(*frames)
+        return frames
+
+    def team(self, team, seasons):
+        """The team sums of IPL.team_sums."""
+        where, parameters = self.where('team', seasons)
+        parameters['entities'] = [team]
+        sums = ', '.join(f"coalesce(sum({column}), 0)::BIGINT AS {column}" for column in self.team_counters)
+        before_sums = ', '.join(f"coalesce(sum({column}) FILTER (WHERE ID < last), 0)::BIGINT AS before_{column}" for column in self.team_counters)
+        rows = f"SELECT * FROM team_matches WHERE {where}"
+
+        with stage('duckdb.team') as step:
+            totals = self.cursor().execute(f"SELECT {sums}, {before_sums} FROM ({rows}), (SELECT max(ID) AS last FROM ({rows}))", parameters).df().iloc[0]
+            overall = totals[self.team_counters]
+            # Without any match, there is no latest one to leave out
+            before_last = totals[[f'before_{column}' for column in self.team_counters]].set_axis(self.team_counters) if overall['matches'] else overall
+            against_team = self.query(f"SELECT Against, {sums} FROM ({rows}) GROUP BY Against ORDER BY Against", parameters, ['Against'])
+            against_season = self.query(f"SELECT Season, {sums} FROM ({rows}) GROUP BY Season ORDER BY Season", parameters, ['Season'])
+            step.built(against_team, against_season)
+        return overall.rename(None), before_last.rename(None), against_team, against_season
+
+
+ENGINES = {'pandas': PandasEngine, 'duckdb': DuckDBEngine}
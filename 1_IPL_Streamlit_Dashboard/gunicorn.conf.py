@@ -0,0 +1,23 @@
+# Production serving of api.py: gunicorn -c gunicorn.conf.py wsgi:app
+import gc
+import os
+import multiprocessing
+
+bind = os.environ.get('IPL_API_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('IPL_API_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('IPL_API_THREADS', 4))
+worker_class = 'gthread'
+
+# Load the IPL dataset once in the master; forked workers share its pages copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    # Keep the garbage collector of each worker from touching (and so copying) the preloaded objects
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork, so every worker runs its own watcher over data/incoming
+    from api import start_watcher
+    start_watcher(server.app.wsgi())
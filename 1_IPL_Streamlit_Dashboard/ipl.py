@@ -1,126 +1,931 @@
 # season of team
 # season of player
 
+import os
+import copy
+import json
 import math
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import functools
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.parquet
+import pyarrow.compute
+from pandas.api.types import union_categoricals
+from cache import LRUCache
+from profiling import stage
+from matchups import Matchups
+from squads import Squads, parse_squads
+from codes import Codes, sorted_names
+from bitmaps import BitmapIndex
+from engines import ENGINES
+
+# Request handlers only read the shared tables: with copy-on-write every filtered or selected
+# frame shares memory with its parent until written to, so no request holds a private copy.
+pd.set_option('mode.copy_on_write', True)
 
 DEFAULT_MATCHES="https://docs.google.com/spreadsheets/d/e/2PACX-1vRy2DUdUbaKx_Co9F0FSnIlyS-8kp4aKv_I0-qzNeghiZHAI_hw94gKG22XTxNJHMFnFVKsO4xWOdIs/pub?gid=1655759976&single=true&output=csv"
 DEFAULT_BALLS="https://docs.google.com/spreadsheets/d/e/2PACX-1vRu6cb6Pj8C9elJc5ubswjVTObommsITlNsFy5X0EiBY7S-lsHEUqx3g_M16r50Ytjc0XQCdGDyzE_Y/pub?output=csv"
 
+# Optimized tables are snapshotted as Parquet next to the CSVs; bump the version whenever
+# read_balls, read_matches or Data_Optimization change so that old snapshots are rebuilt instead of being reused.
+SNAPSHOT_VERSION = 4
+SNAPSHOT_DIR = "data/.snapshot"
+
+# What the record methods aggregate with, see engines.py; IPL(engine=...) overrides it
+ENGINE = os.environ.get('IPL_ENGINE', 'pandas')
+
+# Final dtypes of the ball-by-ball columns, handed to the CSV parser so no int64/object copy is ever built
+BALL_DTYPES = {
+    'ID': np.int32, 'innings': np.int8, 'overs': np.int8, 'ballnumber': np.int8,
+    'batter': 'category', 'bowler': 'category', 'non-striker': 'category', 'extra_type': 'category',
+    'batsman_run': np.int8, 'extras_run': np.int8, 'total_run': np.int8, 'non_boundary': np.int8, 'isWicketDelivery': np.int8,
+    'player_out': 'category', 'kind': 'category', 'fielders_involved': 'category', 'BattingTeam': 'category',
+}
+BALLS_BLOCK_BYTES = 16 << 20 # the CSV is streamed and filtered block by block
+
+# Split seasons are filed under the year most of their matches were played in
+SEASON_NAMES = {'2007/08': '2008', '2009/10': '2010', '2020/21': '2020'}
+
+# Entity column of each derived table; rows are sorted by entity, then season, then match
+ENTITY_TABLES = {'batting_innings': 'player', 'bowling_innings': 'player', 'team_matches': 'team'}
+
+# Per-match counters of team_matches that teamRecord sums over
+TEAM_COUNTERS = ['matches', 'wins', 'losses', 'titles', 'runs', 'balls', 'wickets', 'conceded_runs', 'conceded_balls', 'conceded_wickets']
+
+# Per-innings counters that batsmanRecord and bowlerRecord sum over
+BATTING_COUNTERS = ['innings', 'runs', 'balls', 'fours', 'sixes', 'fifties', 'hundreds', 'mom']
+BOWLING_COUNTERS = ['innings', 'balls', 'runs', 'wickets', 'w3', 'fours', 'sixes', 'mom']
+
+# Sortable leaderboard metrics with their default; 'Highest Score' and 'Best Figure Fraction'
+# are sorted by their numeric parts, see leaderboard_API
+LEADERBOARD_METRICS = {
+    'batting': ['Runs', 'Innings', 'Not Out', 'Highest Score', 'Average', 'Strike Rate', 'Fifties (50s)', 'Hundreds (100s)', 'Fours', 'Sixes', 'Balls'],
+    'bowling': ['Wickets', 'Innings', 'Best Figure Fraction', 'Average', 'Economy', 'Strike Rate', '3+W', 'Runs', 'Balls', 'Fours', 'Sixes'],
+}
+LEADERBOARD_SORT_KEYS = {
+    'Highest Score': [('highest', False), ('highest_out', True)],
+    'Best Figure Fraction': [('best_wickets', False), ('best_runs', True)],
+}
+
+# Code columns of match_table and deliveries, with the codes.Codes dictionary they index
+MATCH_CODES = {'season': 'seasons', 'team1': 'teams', 'team2': 'teams', 'winner': 'teams', 'player_of_match': 'players', 'venue': 'venues', 'city': 'cities'}
+DELIVERY_CODES = {'season': 'seasons', 'batter': 'players', 'bowler': 'players', 'player_out': 'players', 'batting_team': 'teams', 'bowling_team': 'teams'}
+
+# Dismissals credited to the bowler
+BOWLER_WICKETS = ['caught', 'caught and bowled', 'bowled', 'stumped', 'lbw', 'hit wicket']
+
+# Per-delivery counters of the batter against bowler matchups, see build_matchups
+MATCHUP_COUNTERS = ['balls', 'runs', 'dismissals', 'dots', 'fours', 'sixes']
+MATCHUP_METRICS = ['Balls', 'Runs', 'Dismissals', 'Dots', 'Fours', 'Sixes', 'Strike Rate', 'Average', 'Dot %']
+
+# Codes of match_table's toss_decision, and of the stage dimension of query_API (match_table's playoff flag)
+TOSS_DECISIONS = ['bat', 'field']
+STAGES = ['league', 'playoff']
+
+# Phases of an innings as [first, last) ranges of overs, numbered from 0 as in the ball-by-ball data
+PHASES = {'powerplay': (0, 6), 'middle': (6, 15), 'death': (15, 20)}
+
+# Dimensions query_API can filter and group the deliveries by, see build_query_index
+QUERY_DIMENSIONS = ['season', 'venue', 'city', 'stage', 'toss_decision', 'innings', 'overs', 'phase', 'batting_team', 'bowling_team', 'batter', 'bowler']
+
+# Dimensions of a whole match, which also select and group the per-match rows of team_matches
+QUERY_MATCH_DIMENSIONS = ['season', 'venue', 'city', 'stage', 'toss_decision', 'batting_team', 'bowling_team']
+
+# Metrics of every family of query_API, and the dimension whose distinct (value, match) pairs are innings or matches
+QUERY_METRICS = {
+    'batting': ['Innings', 'Runs', 'Balls', 'Outs', 'Fours', 'Sixes', 'Dots', 'Average', 'Strike Rate', 'Dot %', 'Boundary %'],
+    'bowling': ['Innings', 'Balls', 'Runs', 'Wickets', 'Fours', 'Sixes', 'Dots', 'Average', 'Economy', 'Strike Rate', 'Dot %'],
+    'team': ['Matches', 'Wins', 'Runs', 'Balls', 'Wickets Lost', 'Fours', 'Sixes', 'Extras', 'Run Rate', 'Win %'],
+}
+QUERY_ENTITIES = {'batting': 'batter', 'bowling': 'bowler', 'team': 'batting_team'}
+
+# Counters of a player with no rows in a group, see batting_counters and bowling_counters
+EMPTY_BATTING = {'innings': 0, 'runs': 0, 'balls': 0, 'fours': 0, 'sixes': 0, 'fifties': 0, 'hundreds': 0, 'mom': 0, 'highest': np.nan, 'highest_out': 0, 'outs': 0}
+EMPTY_BOWLING = {'innings': 0, 'balls': 0, 'runs': 0, 'wickets': 0, 'w3': 0, 'fours': 0, 'sixes': 0, 'mom': 0, 'best_wickets': 0, 'best_runs': 0}
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """Return the sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_version(manifest):
+    """Short hash identifying the data a snapshot manifest describes."""
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def entity_offsets(*keys):
+    """Map every value of already sorted key columns to the (start, end) rows it spans; with several
+    columns the values are tuples."""
+    keys = [np.asarray(key) for key in keys]
+    changed = np.zeros(len(keys[0]), dtype=bool)
+    changed[:1] = True
+    for key in keys:
+        changed[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(changed)
+    ends = np.r_[starts[1:], len(changed)].astype(int)
+    labels = keys[0][starts] if len(keys) == 1 else zip(*(key[starts] for key in keys))
+    return {label: (int(start), int(end)) for label, start, end in zip(labels, starts, ends)}
+
+
+def season_key(seasons):
+    """Normalize a season selection: order and duplicates don't matter, and 'All' wins."""
+    return ('All',) if 'All' in seasons else tuple(sorted(set(seasons)))
+
+
+def cached_response(kind):
+    """Memoize a record API per (kind, entity, seasons, dataset version); errors are not cached."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, entity, seasons=['All']):
+            if type(seasons) != list:
+                return method(self, entity, seasons)
+            key = (kind, entity, season_key(seasons), self.version)
+            compute = lambda: method(self, entity, seasons)
+            return self.response_cache.get_or_compute(key, compute, should_cache=lambda response: 'error' not in response and 'message' not in response)
+        return wrapper
+    return decorator
+
+
+def group_codes(df, by):
+    """One integer per row identifying its group of the `by` columns, ordered like the groups of a sorted
+    groupby, and the values of each column the codes are built from."""
+    codes = np.zeros(len(df), dtype=np.int64)
+    levels = []
+    for column in by:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            column_codes, values = df[column].cat.codes.to_numpy(), df[column].cat.categories
+        else:
+            column_codes, values = pd.factorize(df[column], sort=True)
+        codes = codes * len(values) + column_codes
+        levels.append(values)
+    return codes, levels
+
+
+class Segments:
+    """Rows of df grouped by the `by` columns, for segment reductions (ufunc.reduceat) over every group.
+
+    Rows that are already grouped together, as the entity-sorted tables and their slices are, are not
+    sorted again. `index` holds the groups, in the order of a sorted groupby.
+    """
+
+    def __init__(self, df, by):
+        by = [by] if isinstance(by, str) else list(by)
+        codes, levels = group_codes(df, by)
+        self.size = len(codes)
+        self.order = np.argsort(codes, kind='stable') if len(codes) and (codes[1:] < codes[:-1]).any() else slice(None)
+        codes = codes[self.order]
+        self.starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, dtype=np.intp)
+
+        # Decode the group of every segment back into its values, the last column varying fastest
+        group, arrays = codes[self.starts], []
+        for column, values in zip(reversed(by), reversed(levels)):
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                arrays.append(pd.Categorical.from_codes(group % len(values), dtype=df[column].dtype))
+            else:
+                arrays.append(values.take(group % len(values)))
+            group = group // len(values)
+        self.index = pd.MultiIndex.from_arrays(arrays[::-1], names=by) if len(by) > 1 else pd.Index(arrays[0], name=by[0])
+
+    def reduce(self, ufunc, values):
+        # Integer sums are taken in int64, as groupby sums are, so int16 counters cannot wrap; maxima keep the column's dtype
+        dtype = np.int64 if ufunc is np.add and values.dtype.kind in 'biu' else values.dtype
+        return ufunc.reduceat(values[self.order], self.starts, dtype=dtype) if len(self.starts) else values[:0].astype(dtype)
+
+    def spread(self, reduced):
+        """The reduced value of its group, for every row."""
+        values = np.empty(self.size, dtype=reduced.dtype)
+        values[self.order] = np.repeat(reduced, np.diff(np.r_[self.starts, self.size]))
+        return values
+
+
+def batting_key(innings):
+    """One integer per batting_innings row, ordered like scores: innings first (rows without an innings
+    rank last), then runs, then not out (49* ranks above 49)."""
+    return innings.innings.to_numpy(np.int64) << 17 | innings.runs.to_numpy(np.int64) << 1 | 1 - innings.out.to_numpy(np.int64)
+
+
+def bowling_key(innings):
+    """One integer per bowling_innings row, ordered like figures: most wickets, then fewest runs."""
+    return innings.wickets.to_numpy(np.int64) << 16 | 0xFFFF - innings.runs.to_numpy(np.int64)
+
+
+def before_last_match(df, columns, key, counted):
+    """Per-player sums of `columns` and maximum of `key` over the rows of df, overall and without each
+    player's latest match among the `counted` rows, from one pass of segment reductions.
+
+    A player has one row per match, so the record before the latest match is the overall sums minus
+    that row. The best of the other rows is the running second best of the maximum, taken here as
+    the maximum with the latest row left out. Players without counted rows before it get no entry.
+    """
+    segments = Segments(df, 'player')
+    ids = df.ID.to_numpy()
+    last_match = segments.reduce(np.maximum, np.where(counted, ids, -1))
+    is_last = counted & (ids == segments.spread(last_match))
+
+    overall, before = {}, {}
+    for column in columns:
+        values = df[column].to_numpy()
+        overall[column] = segments.reduce(np.add, values)
+        before[column] = overall[column] - segments.reduce(np.add, np.where(is_last, values, 0))
+    best, best_before = segments.reduce(np.maximum, key), segments.reduce(np.maximum, np.where(counted & ~is_last, key, -1))
+    return segments.index, overall, best, before, best_before, best_before >= 0
+
+
+def counter_records(counters):
+    """{group: {counter: value}} of a grouped counters frame. Values stay numpy floats so that
+    the rates derived from them round exactly like they did on the numpy sums."""
+    values = counters.to_numpy(dtype=np.float64)
+    return {key: dict(zip(counters.columns, row)) for key, row in zip(counters.index, values)}
+
+
+def concat_tables(frames):
+    """Concatenate frames, merging the categories of categorical columns instead of falling back to object."""
+    table = pd.concat(frames, ignore_index=True)
+    for column in frames[0].columns:
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            table[column] = union_categoricals([frame[column] for frame in frames], sort_categories=True)
+    return table
+
+
+def normalize_season(season):
+    return SEASON_NAMES.get(season, season)
+
+
+def fetch_source(path, url):
+    """Download the published sheet to `path` once, so later starts can work offline."""
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        urllib.request.urlretrieve(url, path + '.part')
+        os.replace(path + '.part', path)
+    return path
+
+
+class lazy:
+    """An IPL attribute set by the method named `builder` when first read, so that a table is only loaded,
+    or an index built, once something uses it. Under the dataset's build lock, so a builder runs once
+    even when requests and the warm-up thread ask for its attributes at the same time."""
+
+    def __init__(self, builder):
+        self.builder = builder
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, ipl, owner=None):
+        if ipl is None:
+            return self
+        with ipl.build_lock:
+            if self.name not in ipl.__dict__:
+                start = time.perf_counter()
+                with stage(f'ipl.{self.builder}'):
+                    getattr(ipl, self.builder)()
+                ipl.load_seconds[self.builder] = time.perf_counter() - start
+        # Stored on the instance, so later reads never get here
+        return ipl.__dict__[self.name]
+
+
+def lazy_attributes(builder, count):
+    return [lazy(builder) for _ in range(count)]
+
+
 class IPL:
     OBJECT_NUMBER = 0
 
-    def __init__(self, ipl_matches="data/IPL_Matches_2008_2022.csv", ipl_balls="data/IPL_Ball_by_Ball_2008_2022.csv"):
-        self.matches = pd.read_csv(DEFAULT_MATCHES) #(ipl_matches)
-        self.balls = pd.read_csv(DEFAULT_BALLS) #(ipl_balls)
-        self.Data_Optimization()
+    # Loaded or built on first use, by the methods named, in the order warm_up builds them: whatever
+    # the listings and input validation need comes first, as it only reads the small matches file
+    version, last_modified, snapshot_fresh = lazy_attributes('check_snapshot', 3)
+    matches, = lazy_attributes('load_matches', 1)
+    squad_rows, = lazy_attributes('build_squad_rows', 1)
+    seasons, teams, players, season_set, team_set, player_set, catalog = lazy_attributes('build_catalogs', 7)
+    balls, = lazy_attributes('load_balls', 1)
+    codes, squads, match_table = lazy_attributes('build_codes', 3)
+    deliveries, = lazy_attributes('build_deliveries', 1)
+    batting_innings, bowling_innings = lazy_attributes('build_innings', 2)
+    team_matches, = lazy_attributes('build_team_matches', 1)
+    season_bowling_teams, = lazy_attributes('build_season_bowling_teams', 1)
+    offsets, season_offsets = lazy_attributes('build_offsets', 2)
+    season_partials, = lazy_attributes('build_partials', 1)
+    matchups, = lazy_attributes('build_matchups', 1)
+    query_index, query_match_index, query_counters = lazy_attributes('build_query_index', 3)
+    engine, = lazy_attributes('build_engine', 1)
+
+    def __init__(self, ipl_matches="data/IPL_Matches_2008_2022.csv", ipl_balls="data/IPL_Ball_by_Ball_2008_2022.csv", snapshot_dir=SNAPSHOT_DIR, warm_up=False, engine=None):
+        """Nothing is read here: the files are downloaded, loaded and indexed on first use, or by a
+        background warm-up thread started right away when warm_up is true."""
+        self.engine_name = engine or ENGINE
+        if self.engine_name not in ENGINES:
+            raise ValueError(f"Unknown engine {self.engine_name!r}, use one of {sorted(ENGINES)}")
+        self.ipl_matches = ipl_matches
+        self.ipl_balls = ipl_balls
+        self.snapshot_dir = snapshot_dir
+        self.response_cache = LRUCache()
+        self.build_lock = threading.RLock()
+        self.load_seconds = {} # builder -> seconds it took
 
-        self.limited_ball_match = self.balls.merge(self.matches[['ID','Season','MatchNumber','Team1','Team2', 'WinningTeam', 'Player_of_Match']], on='ID', how='inner').copy()
-        
         IPL.OBJECT_NUMBER += 1
         print("IPL object created", IPL.OBJECT_NUMBER)
+        if warm_up:
+            self.warm_up(background=True)
+
+    # Data Loading
+    def lazy_names(self):
+        return [name for name, attribute in vars(IPL).items() if isinstance(attribute, lazy)]
+
+    def warm_up(self, background=False):
+        """Load and build everything now, in a daemon thread if background; requests served meanwhile
+        only wait for the tables they need."""
+        if background:
+            thread = threading.Thread(target=self.build_all, name='ipl-warm-up', daemon=True)
+            thread.start()
+            return thread
+        # Nothing is served meanwhile, so the balls come first and both files are parsed at once, see load_balls
+        start = time.perf_counter()
+        self.balls
+        self.build_all(start)
+
+    def build_all(self, start=None):
+        # In lazy_names order, so a background warm-up has the listings ready first
+        start = start or time.perf_counter()
+        for name in self.lazy_names():
+            getattr(self, name)
+        steps = ', '.join(f"{builder} {seconds * 1000:.0f} ms" for builder, seconds in self.load_seconds.items())
+        print(f"IPL object {IPL.OBJECT_NUMBER} ready in {time.perf_counter() - start:.2f} s ({steps})")
+
+    def reload(self, warm_up=False):
+        """Return a new IPL loaded from the same files as they are now, with an empty response cache.
+
+        Like append_matches, self is left untouched, so requests already running on it finish on the
+        old version; swapping the returned object in where self was held publishes the new one, as
+        SharedDataset does.
+        """
+        ipl = IPL(self.ipl_matches, self.ipl_balls, self.snapshot_dir, warm_up, self.engine_name)
+        ipl.response_cache = LRUCache(self.response_cache.max_entries, self.response_cache.max_bytes)
+        return ipl
+
+    def check_snapshot(self):
+        """Identify the source files, downloading them if missing, and whether the snapshot was built from them."""
+        self.ipl_matches = fetch_source(self.ipl_matches, DEFAULT_MATCHES)
+        self.ipl_balls = fetch_source(self.ipl_balls, DEFAULT_BALLS)
+        self.manifest = {
+            'version': SNAPSHOT_VERSION,
+            'matches': file_checksum(self.ipl_matches),
+            'balls': file_checksum(self.ipl_balls),
+        }
+        # Identifies the loaded data, e.g. in cache keys and HTTP ETags
+        self.version = manifest_version(self.manifest)
+        self.last_modified = max(os.path.getmtime(self.ipl_matches), os.path.getmtime(self.ipl_balls))
+        # Every snapshot has a directory of its own, named by its version and never rewritten, see load_balls
+        self.snapshot_data = os.path.join(self.snapshot_dir, self.version)
+        try:
+            with open(os.path.join(self.snapshot_dir, 'manifest.json')) as f:
+                self.snapshot_fresh = json.load(f) == self.manifest
+        except (OSError, ValueError):
+            self.snapshot_fresh = False
+
+    def load_matches(self):
+        if self.snapshot_fresh:
+            self.matches = pd.read_parquet(os.path.join(self.snapshot_data, 'matches.parquet'))
+        else:
+            self.matches = self.read_matches()
+
+    def load_balls(self):
+        """Load the optimized deliveries from the snapshot, rebuilding it from the CSVs when stale."""
+        if self.snapshot_fresh:
+            # Read as one dataset, so Arrow unifies the dictionaries of all the files at once
+            self.balls = pa.parquet.read_table(os.path.join(self.snapshot_data, 'balls')).to_pandas(split_blocks=True, self_destruct=True)
+            for column, dtype in BALL_DTYPES.items():
+                if dtype == 'category':
+                    self.balls[column] = self.balls[column].cat.reorder_categories(sorted(self.balls[column].cat.categories))
+            return
+
+        # When the matches are not loaded yet (see warm_up), the small matches file is parsed on a
+        # worker while this thread streams the balls
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            matches = pool.submit(self.read_matches) if 'matches' not in self.__dict__ else None
+            self.balls = self.read_balls()
+            if matches is not None:
+                self.matches = matches.result()
+
+        # Other processes may be reading the snapshot of the previous manifest, so nothing is rewritten in
+        # place: the tables are written to a temporary directory, renamed to the snapshot's own directory,
+        # and only then does the manifest (itself replaced via rename) point to it
+        manifest_path = os.path.join(self.snapshot_dir, 'manifest.json')
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            building = tempfile.mkdtemp(prefix='.building-', dir=self.snapshot_dir)
+            try:
+                self.matches.to_parquet(os.path.join(building, 'matches.parquet'))
+
+                # Deliveries of matches missing from the matches file are kept, in an 'unmatched' partition
+                seasons = self.balls.ID.map(dict(zip(self.matches.ID, self.matches.Season))).fillna('unmatched')
+                os.makedirs(os.path.join(building, 'balls'))
+                for season, partition in self.balls.groupby(seasons, sort=True):
+                    partition.to_parquet(os.path.join(building, 'balls', f'{season}.parquet'), index=False)
+
+                if not os.path.isdir(self.snapshot_data): # else another process wrote the same snapshot first
+                    os.replace(building, self.snapshot_data)
+            finally:
+                shutil.rmtree(building, ignore_errors=True)
+
+            try:
+                with open(manifest_path) as f:
+                    previous = manifest_version(json.load(f))
+            except (OSError, ValueError):
+                previous = None
+            with open(manifest_path + '.tmp', 'w') as f:
+                json.dump(self.manifest, f)
+            os.replace(manifest_path + '.tmp', manifest_path)
+
+            # Older snapshots go, but the previous one may still be in use by a process that read its manifest
+            for name in os.listdir(self.snapshot_dir):
+                path = os.path.join(self.snapshot_dir, name)
+                if name in (self.version, previous) or name.startswith(('manifest.json', '.building-')):
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+        except OSError as e:
+            print("IPL snapshot not written:", e) # read-only deploys still work from the CSVs
+
+    def build_squad_rows(self):
+        self.squad_rows = parse_squads(self.matches)
+
+    def build_codes(self):
+        self.codes = Codes.of(self.matches, self.balls, self.squad_rows[3])
+        self.squads = Squads(*self.squad_rows, self.codes)
+        self.match_table = self.match_table_of(self.matches)
+
+    def build_deliveries(self):
+        self.deliveries = self.deliveries_of(self.balls)
+        # Everything is read from deliveries from here on; None rather than deleted, so the files are not read again
+        self.balls = None
+
+    def build_innings(self):
+        self.batting_innings, self.bowling_innings = self.innings_tables(self.deliveries)
+
+    def build_team_matches(self):
+        self.team_matches = self.team_matches_table(self.deliveries)
+
+    def build_partials(self):
+        self.season_partials = self.partials_of(self.batting_innings, self.bowling_innings)
+
+    def build_engine(self):
+        self.engine = ENGINES[self.engine_name](self)
+
+    # Incremental Loading
+    def append_matches(self, matches, balls):
+        """Return a new IPL with `matches` and their `balls` appended, without reloading the existing data.
+
+        self is left untouched, so requests already running on it finish on a consistent dataset;
+        swapping the returned object in where self was held publishes the new version atomically.
+        """
+        self.validate_new_matches(matches, balls)
+        matches, balls = self.Data_Optimization(matches.copy(), balls.copy())
+
+        # The copy starts with none of self's lazy attributes, so none of them can go stale
+        ipl = copy.copy(self)
+        ipl.build_lock, ipl.load_seconds = threading.RLock(), {}
+        for name in ipl.lazy_names():
+            ipl.__dict__.pop(name, None)
+        ipl.matches = concat_tables([self.matches, matches])
+        ipl.balls = None # as after build_deliveries
+
+        # New names get new codes, so the coded tables are recoded only when the dictionaries grew
+        squads = parse_squads(matches)
+        ipl.squad_rows = tuple(np.concatenate([old, new]) for old, new in zip(self.squad_rows, squads))
+        ipl.codes = self.codes.extended(matches, balls, squads[3])
+        ipl.match_table = pd.concat([ipl.recoded(self.match_table, MATCH_CODES, self.codes), ipl.match_table_of(matches)]).sort_values('ID', ignore_index=True)
+        deliveries = ipl.deliveries_of(balls)
+        ipl.deliveries = pd.concat([ipl.recoded(self.deliveries, DELIVERY_CODES, self.codes), deliveries]).sort_values('season', kind='stable', ignore_index=True)
+
+        # Only the new deliveries are aggregated; their rows belong to new matches, so they never
+        # merge with existing rows and the tables only need re-sorting for the offset tables
+        batting, bowling = ipl.innings_tables(deliveries)
+        ipl.batting_innings = concat_tables([self.batting_innings, batting]).sort_values(['player', 'Season', 'ID'], ignore_index=True)
+        ipl.bowling_innings = concat_tables([self.bowling_innings, bowling]).sort_values(['player', 'Season', 'ID'], ignore_index=True)
+        ipl.team_matches = concat_tables([self.team_matches, ipl.team_matches_table(deliveries)]).sort_values(['team', 'Season', 'ID'], ignore_index=True)
+        ipl.squads = self.squads.appended(squads, ipl.codes)
+        ipl.build_catalogs()
+        ipl.build_season_bowling_teams()
+        ipl.build_offsets()
+        ipl.build_matchups()
+
+        # A new match may fall in a season a player already has a partial for, so those are combined
+        new_partials = ipl.partials_of(batting, bowling)
+        ipl.season_partials = {
+            kind: ipl.reduce_partials(kind, pd.concat([self.season_partials[kind], new_partials[kind]]), ['player', 'Season'])
+            for kind in new_partials
+        }
 
+        # Set together, as check_snapshot would otherwise run on first use and reset the version to the source files'
+        ipl.version = hashlib.sha256((self.version + ','.join(map(str, sorted(matches.ID)))).encode()).hexdigest()[:16]
+        ipl.last_modified = time.time()
+        ipl.snapshot_fresh = self.snapshot_fresh
+        ipl.response_cache = LRUCache(self.response_cache.max_entries, self.response_cache.max_bytes)
+        return ipl
+
+    def validate_new_matches(self, matches, balls):
+        missing = (set(self.matches.columns) - set(matches.columns)) | (set(BALL_DTYPES) - set(balls.columns))
+        if missing:
+            raise ValueError(f"Missing columns: {sorted(missing)}")
+        if matches.empty or balls.empty:
+            raise ValueError("No matches or deliveries to append")
+        if matches.ID.duplicated().any() or matches.ID.isin(self.matches.ID).any():
+            raise ValueError("Match IDs must be new and unique")
+        if not balls.ID.isin(matches.ID).all():
+            raise ValueError("Every delivery must belong to one of the appended matches")
+        if balls.duplicated(['ID', 'innings', 'overs', 'ballnumber']).any():
+            raise ValueError("Duplicate deliveries")
+        # Playing XIs are stringified lists, see parse_squads
+        for column in ('Team1Players', 'Team2Players'):
+            squads = matches[column]
+            if not squads.map(lambda squad: isinstance(squad, str) and squad.startswith("['") and squad.endswith("']")).all():
+                raise ValueError(f"Missing or malformed {column}, expected lists like ['Player 1', 'Player 2']")
 
     # Data Cleaning
-    def Data_Optimization(self):
-        self.balls.ID = self.balls.ID.astype(np.int32)
-        self.balls.innings = self.balls.innings.astype(np.int8)
-        self.balls.overs = self.balls.overs.astype(np.int8)
-        self.balls.ballnumber = self.balls.ballnumber.astype(np.int8)
-        self.balls.batter = self.balls.batter.astype('category')
-        self.balls.bowler = self.balls.bowler.astype('category')
-        self.balls['non-striker'] = self.balls['non-striker'].astype('category')
-        self.balls.extra_type = self.balls.extra_type.astype('category')
-        self.balls.batsman_run = self.balls.batsman_run.astype(np.int8)
-        self.balls.extras_run = self.balls.extras_run.astype(np.int8)
-        self.balls.total_run = self.balls.total_run.astype(np.int8)
-        self.balls.non_boundary = self.balls.non_boundary.astype(np.int8)
-        self.balls.isWicketDelivery = self.balls.isWicketDelivery.astype(np.int8)
-        self.balls.player_out = self.balls.player_out.astype('category')
-        self.balls.kind = self.balls.kind.astype('category')
-        self.balls.fielders_involved = self.balls.fielders_involved.astype('category')
-        self.balls.BattingTeam = self.balls.BattingTeam.astype('category')
-
-        self.matches.loc[self.matches['Season'] == '2007/08', 'Season'] = '2008'
-        self.matches.loc[self.matches['Season'] == '2009/10', 'Season'] = '2010'
-        self.matches.loc[self.matches['Season'] == '2020/21', 'Season'] = '2020'
-
-        self.balls = self.balls[self.balls.innings.isin([1, 2])]#.copy() # Excluding Super overs
+    def read_matches(self):
+        # Seasons are read as strings (a file of single-year seasons would parse as numbers) and renamed as parsed
+        return pd.read_csv(self.ipl_matches, converters={'Season': normalize_season})
+
+    def read_balls(self):
+        """Stream the ball-by-ball CSV through Arrow's threaded parser straight into BALL_DTYPES, dropping super overs per block."""
+        column_types = {
+            column: pa.dictionary(pa.int32(), pa.string()) if dtype == 'category' else pa.from_numpy_dtype(dtype)
+            for column, dtype in BALL_DTYPES.items()
+        }
+        reader = pyarrow.csv.open_csv(
+            self.ipl_balls,
+            read_options=pyarrow.csv.ReadOptions(block_size=BALLS_BLOCK_BYTES),
+            convert_options=pyarrow.csv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+        )
+        innings = pa.array([1, 2], pa.int8()) # Excluding Super overs
+        blocks = [block.filter(pyarrow.compute.is_in(block['innings'], innings)) for block in reader]
+        table = pa.Table.from_batches(blocks, reader.schema)
+        del blocks # so that each Arrow column is released as soon as it is converted
+        balls = table.to_pandas(split_blocks=True, self_destruct=True)
+
+        # Arrow keeps categories in order of appearance; sorted ones match astype('category')
+        for column, dtype in BALL_DTYPES.items():
+            if dtype == 'category':
+                balls[column] = balls[column].cat.reorder_categories(sorted(balls[column].cat.categories))
+        return balls
+
+    def Data_Optimization(self, matches, balls):
+        # Same tables as read_matches and read_balls, for frames that were not read by them (see append_matches)
+        balls = balls.astype(BALL_DTYPES)
+        matches['Season'] = matches['Season'].astype(str).map(normalize_season)
+
+        balls = balls[balls.innings.isin([1, 2])]#.copy() # Excluding Super overs
+        return matches, balls
+
+    # Coded Tables
+    def match_table_of(self, matches):
+        """One row per match of `matches`, sorted by ID, with its teams, players, season, venue and city as codes, see MATCH_CODES."""
+        encode = self.codes.encode
+        return pd.DataFrame({
+            'ID': matches['ID'].to_numpy(np.int32),
+            'season': encode('seasons', matches['Season']),
+            'team1': encode('teams', matches['Team1']),
+            'team2': encode('teams', matches['Team2']),
+            'winner': encode('teams', matches['WinningTeam']),
+            'player_of_match': encode('players', matches['Player_of_Match']),
+            'venue': encode('venues', matches['Venue']),
+            'city': encode('cities', matches['City']),
+            'toss_decision': pd.Categorical(matches['TossDecision'], categories=TOSS_DECISIONS).codes,
+            'final': (matches['MatchNumber'] == 'Final').to_numpy(),
+            # League matches are numbered, playoffs are named (Qualifier 1, Eliminator, Final...)
+            'playoff': ~matches['MatchNumber'].astype(str).str.isdigit().to_numpy(),
+        }).sort_values('ID', ignore_index=True)
+
+    def match_rows(self, ids):
+        """Rows of match_table of the match `ids`, -1 for unknown matches."""
+        known = self.match_table.ID.to_numpy()
+        if not len(known):
+            return np.full(len(ids), -1)
+        rows = np.searchsorted(known, ids).clip(max=len(known) - 1)
+        return np.where(known.take(rows) == ids, rows, -1)
+
+    def deliveries_of(self, balls):
+        """The deliveries of `balls` in known matches as small integer columns, one block of rows per season.
+
+        Teams, players and seasons are codes, see DELIVERY_CODES, and everything else about the match
+        stays in match_table; the bowling team is resolved here, once.
+        """
+        rows = self.match_rows(balls.ID.to_numpy())
+        if (rows < 0).any():
+            balls, rows = balls[rows >= 0], rows[rows >= 0]
+        column = lambda name: balls[name].to_numpy()
+        code = lambda kind, name: self.codes.encode(kind, balls[name])
+        match = lambda name: self.match_table[name].to_numpy().take(rows)
+
+        batting_team, team1 = code('teams', 'BattingTeam'), match('team1')
+        deliveries = pd.DataFrame({
+            'ID': column('ID'),
+            'season': match('season'),
+            'innings': column('innings'),
+            'overs': column('overs'),
+            'ballnumber': column('ballnumber'),
+            'batter': code('players', 'batter'),
+            'bowler': code('players', 'bowler'),
+            'player_out': code('players', 'player_out'),
+            'batting_team': batting_team,
+            'bowling_team': np.where(batting_team == team1, match('team2'), team1),
+            'extra_type': balls.extra_type.array,
+            'kind': balls.kind.array,
+            'batsman_run': column('batsman_run'),
+            'extras_run': column('extras_run'),
+            'total_run': column('total_run'),
+            'non_boundary': column('non_boundary'),
+            'isWicketDelivery': column('isWicketDelivery'),
+        })
+        return deliveries.sort_values('season', kind='stable', ignore_index=True)
+
+    def recoded(self, table, columns, old_codes):
+        """`table` with its code `columns` (see MATCH_CODES) moved from old_codes to this dataset's codes."""
+        if all(len(getattr(old_codes, kind)) == len(getattr(self.codes, kind)) for kind in set(columns.values())):
+            return table
+        return table.assign(**{column: self.codes.recode(old_codes, kind, table[column].to_numpy()) for column, kind in columns.items()})
+
+    # Innings Tables
+    def innings_tables(self, deliveries):
+        """Collapse `deliveries` into one row per (player, match) for batting and for bowling."""
+        is_boundary = deliveries.non_boundary == 0
+        player_out = deliveries.player_out.to_numpy()
+
+        # Batting: deliveries faced, plus dismissals of the batsman without facing (non-striker run outs)
+        faced = pd.DataFrame({
+            'player': deliveries.batter,
+            'ID': deliveries.ID,
+            'BowlingTeam': deliveries.bowling_team,
+            'deliveries': np.int16(1),
+            'balls': (deliveries.extra_type != 'wides').astype(np.int16),
+            'runs': deliveries.batsman_run.astype(np.int16),
+            'fours': ((deliveries.batsman_run == 4) & is_boundary).astype(np.int16),
+            'sixes': ((deliveries.batsman_run == 6) & is_boundary).astype(np.int16),
+            'out': (deliveries.player_out == deliveries.batter).astype(np.int16),
+            'dismissed': np.int16(0),
+        })
+        dismissals = faced[player_out >= 0].assign(player=player_out[player_out >= 0])
+        dismissals[['deliveries', 'balls', 'runs', 'fours', 'sixes', 'out']] = 0
+        dismissals['dismissed'] = np.int16(1)
+
+        batting = pd.concat([faced, dismissals]).groupby(['player', 'ID', 'BowlingTeam']).sum().reset_index()
+        batting['BowlingTeam'] = self.codes.names('teams', batting.BowlingTeam)
+        batting = self.with_match_columns(batting)
+        # Per-innings flags, so that every batting record is a plain sum; dismissal-only rows are no innings
+        batting['innings'] = (batting.deliveries > 0).astype(np.int16)
+        batting['fifties'] = ((batting.runs >= 50) & (batting.runs < 100)).astype(np.int16)
+        batting['hundreds'] = (batting.runs >= 100).astype(np.int16)
+        batting['mom'] = batting.mom * batting.innings
+
+        # Bowling: runs and wickets credited to the bowler
+        bowling = pd.DataFrame({
+            'player': deliveries.bowler,
+            'ID': deliveries.ID,
+            'BattingTeam': deliveries.batting_team,
+            'balls': (~deliveries.extra_type.isin(['wides', 'noballs'])).astype(np.int16),
+            'runs': np.where(deliveries.extra_type.isin(['penalty', 'legbyes', 'byes']), 0, deliveries.total_run).astype(np.int16),
+            'wickets': np.where(deliveries.kind.isin(BOWLER_WICKETS), deliveries.isWicketDelivery, 0).astype(np.int16),
+            'fours': ((deliveries.batsman_run == 4) & is_boundary).astype(np.int16),
+            'sixes': ((deliveries.batsman_run == 6) & is_boundary).astype(np.int16),
+        })
+        bowling = bowling.groupby(['player', 'ID', 'BattingTeam']).sum().reset_index()
+        # Keep every batting team as a category so that "against" lists all teams, as before
+        bowling['BattingTeam'] = pd.Categorical(self.codes.names('teams', bowling.BattingTeam), categories=self.codes.teams)
+        bowling = self.with_match_columns(bowling)
+        bowling['innings'] = np.int16(1)
+        bowling['w3'] = (bowling.wickets >= 3).astype(np.int16)
+        return batting.sort_values(['player', 'Season', 'ID'], ignore_index=True), bowling.sort_values(['player', 'Season', 'ID'], ignore_index=True)
+
+    def team_matches_table(self, deliveries):
+        """One row per (team, match) of `deliveries` with the team's batting and bowling totals of that match."""
+        per_innings = pd.DataFrame({
+            'ID': deliveries.ID,
+            'team': deliveries.batting_team,
+            'runs': deliveries.total_run.astype(np.int32),
+            'balls': (deliveries.extra_type != 'wides').astype(np.int32),
+            'wickets': deliveries.isWicketDelivery.astype(np.int32),
+        }).groupby(['ID', 'team']).sum().reset_index()
+        match_totals = per_innings.groupby('ID')[['runs', 'balls', 'wickets']].sum()
+
+        played = self.match_table[self.match_table.ID.isin(match_totals.index)]
+        sides = []
+        for team, against in (('team1', 'team2'), ('team2', 'team1')):
+            sides.append(pd.DataFrame({'team': played[team], 'Against': played[against], 'ID': played.ID, 'Season': played.season, 'winner': played.winner, 'final': played.final}))
+        team_matches = pd.concat(sides, ignore_index=True)
+
+        batting = team_matches.merge(per_innings, on=['ID', 'team'], how='left')[['runs', 'balls', 'wickets']].fillna(0).astype(np.int32)
+        totals = match_totals.loc[team_matches.ID].reset_index(drop=True)
+
+        is_win = team_matches.winner == team_matches.team
+        team_matches['matches'] = np.int32(1)
+        team_matches['wins'] = is_win.astype(np.int32)
+        team_matches['losses'] = (~is_win).astype(np.int32) # no result counts as not won, as before
+        team_matches['titles'] = (is_win & team_matches.final).astype(np.int32)
+        team_matches['runs'] = batting.runs
+        team_matches['balls'] = batting.balls
+        team_matches['wickets'] = totals.wickets - batting.wickets # taken by the team = fallen in the other innings
+        team_matches['conceded_runs'] = totals.runs - batting.runs
+        team_matches['conceded_balls'] = totals.balls - batting.balls
+        team_matches['conceded_wickets'] = batting.wickets
+
+        team_matches['team'] = self.codes.names('teams', team_matches.team)
+        team_matches['Against'] = self.codes.names('teams', team_matches.Against)
+        team_matches['Season'] = self.codes.names('seasons', team_matches.Season)
+        return team_matches.drop(columns=['winner', 'final']).sort_values(['team', 'Season', 'ID'], ignore_index=True)
+
+    def build_offsets(self):
+        """Row ranges of every player/team in the entity-sorted tables, and of every season within
+        them, so a lookup is a slice and a season filter only reads the seasons asked for."""
+        self.offsets = {table: entity_offsets(getattr(self, table)[entity]) for table, entity in ENTITY_TABLES.items()}
+        self.season_offsets = {table: entity_offsets(getattr(self, table)[entity], getattr(self, table)['Season']) for table, entity in ENTITY_TABLES.items()}
+
+    def entity_rows(self, table, *keys, seasons=['All']):
+        keys = dict.fromkeys(keys)
+        if 'All' in seasons:
+            ranges = [self.offsets[table].get(key, (0, 0)) for key in keys]
+        else:
+            ranges = [self.season_offsets[table].get((key, season), (0, 0)) for key in keys for season in sorted(set(seasons))]
+        if len(ranges) <= 1:
+            return getattr(self, table).iloc[slice(*ranges[0]) if ranges else slice(0, 0)]
+        return getattr(self, table).iloc[np.concatenate([np.arange(start, end) for start, end in ranges])]
+
+    def with_match_columns(self, innings):
+        # Joined through match_table, then the player codes become a categorical of the players present
+        rows = self.match_rows(innings.ID.to_numpy())
+        innings['Season'] = self.codes.names('seasons', self.match_table.season.to_numpy().take(rows))
+        innings['mom'] = (self.match_table.player_of_match.to_numpy().take(rows) == innings.player).astype(np.int16)
+        innings['player'] = self.codes.decode('players', innings.player).remove_unused_categories()
+        return innings
+
+
+    def build_matchups(self):
+        """Batter against bowler counters of every pair that met, per season, see matchups.Matchups."""
+        deliveries = self.deliveries
+        faced = deliveries.extra_type != 'wides'
+        is_boundary = deliveries.non_boundary == 0
+        counters = pd.DataFrame({
+            'balls': faced,
+            'runs': deliveries.batsman_run,
+            'dismissals': (deliveries.player_out == deliveries.batter) & deliveries.kind.isin(BOWLER_WICKETS),
+            'dots': faced & (deliveries.batsman_run == 0),
+            'fours': (deliveries.batsman_run == 4) & is_boundary,
+            'sixes': (deliveries.batsman_run == 6) & is_boundary,
+        })
+        batter, bowler, season = (pd.Series(self.codes.decode(kind, deliveries[column])) for column, kind in (('batter', 'players'), ('bowler', 'players'), ('season', 'seasons')))
+        self.matchups = Matchups(batter, bowler, season, counters[MATCHUP_COUNTERS])
+
+
+    def build_query_index(self):
+        """Bitmap indexes of the deliveries by every QUERY_DIMENSIONS and of team_matches by the
+        QUERY_MATCH_DIMENSIONS, and the per-delivery counters of every family of query_API."""
+        deliveries = self.deliveries
+        numbers = lambda column: (np.searchsorted(np.unique(column), column).astype(np.int16), np.unique(column))
+        overs = deliveries.overs.to_numpy()
+        starts, ends = zip(*PHASES.values())
+        phase = np.where(overs < ends[-1], np.searchsorted(starts, overs, side='right') - 1, -1).astype(np.int8)
+        self.query_index = BitmapIndex({
+            **self.match_dimensions(deliveries.ID),
+            'innings': numbers(deliveries.innings.to_numpy()),
+            'overs': numbers(overs),
+            'phase': (phase, np.array(list(PHASES))),
+            'batting_team': (deliveries.batting_team.to_numpy(), self.codes.teams),
+            'bowling_team': (deliveries.bowling_team.to_numpy(), self.codes.teams),
+            'batter': (deliveries.batter.to_numpy(), self.codes.players),
+            'bowler': (deliveries.bowler.to_numpy(), self.codes.players),
+        })
+        # A team's matches and wins are counted from its team_matches rows, which include the matches it never batted in
+        self.query_match_index = BitmapIndex({
+            **self.match_dimensions(self.team_matches.ID),
+            'batting_team': (self.codes.encode('teams', self.team_matches.team), self.codes.teams),
+            'bowling_team': (self.codes.encode('teams', self.team_matches.Against), self.codes.teams),
+        })
+
+        faced = deliveries.extra_type != 'wides'
+        legal = ~deliveries.extra_type.isin(['wides', 'noballs'])
+        is_boundary = deliveries.non_boundary == 0
+        fours, sixes = (deliveries.batsman_run == 4) & is_boundary, (deliveries.batsman_run == 6) & is_boundary
+        conceded = np.where(deliveries.extra_type.isin(['penalty', 'legbyes', 'byes']), 0, deliveries.total_run)
+        frame = lambda **columns: pd.DataFrame({name: np.asarray(column, dtype=np.int16) for name, column in columns.items()})
+        self.query_counters = {
+            'batting': frame(runs=deliveries.batsman_run, balls=faced, outs=deliveries.player_out == deliveries.batter, fours=fours, sixes=sixes, dots=faced & (deliveries.batsman_run == 0)),
+            'bowling': frame(balls=legal, runs=conceded, wickets=deliveries.kind.isin(BOWLER_WICKETS) & (deliveries.isWicketDelivery == 1), fours=fours, sixes=sixes, dots=legal & (conceded == 0)),
+            'team': frame(runs=deliveries.total_run, balls=faced, wickets_lost=deliveries.isWicketDelivery, fours=fours, sixes=sixes, extras=deliveries.extras_run),
+        }
+
+    def match_dimensions(self, ids):
+        """The whole-match QUERY_DIMENSIONS of rows of the match `ids`, as BitmapIndex dimensions."""
+        rows = self.match_rows(ids.to_numpy())
+        match = lambda name: self.match_table[name].to_numpy().take(rows)
+        return {
+            'season': (match('season'), self.codes.seasons),
+            'venue': (match('venue'), self.codes.venues),
+            'city': (match('city'), self.codes.cities),
+            'stage': (match('playoff').astype(np.int8), np.array(STAGES)),
+            'toss_decision': (match('toss_decision'), np.array(TOSS_DECISIONS)),
+        }
+
+
+    # Catalogs
+    def build_catalogs(self):
+        """Sorted listings and frozen lookup sets of seasons, teams and players, from the matches file alone."""
+        self.seasons = np.unique(self.matches['Season'])
+        self.teams = np.unique(np.append(self.matches['Team1'], self.matches['Team2']))
+        self.players = sorted_names(self.squad_rows[3])
+
+        self.season_set = frozenset(['All'] + self.seasons.tolist())
+        self.team_set = frozenset(self.teams.tolist())
+        self.player_set = frozenset(self.players.tolist())
+
+        seasons = ['All'] + self.seasons.tolist()
+        self.catalog = {
+            'seasons': {"seasons": seasons, "total_seasons": len(seasons)},
+            'teams': {"teams": self.teams.tolist(), "total_teams": len(self.teams)},
+            'players': {"total_players": len(self.players), "players": self.players.tolist()},
+        }
+
+    def build_season_bowling_teams(self):
+        self.season_bowling_teams = {season: frozenset(teams) for season, teams in self.batting_innings.groupby('Season').BowlingTeam.unique().items()}
 
 
     # utility functions
     def allSeasons_API(self):
-        seasons = ['All'] + np.unique(self.matches['Season']).tolist()
-        return {"seasons": seasons, "total_seasons": len(seasons)}
+        return self.catalog['seasons']
 
     def allTeams_API(self):
-        all_teams = np.unique(np.append(self.matches['Team1'], self.matches['Team2'])).copy()
-
-        response = {"teams": all_teams.tolist(), "total_teams": len(all_teams)}
-        return response
+        return self.catalog['teams']
 
     def allPlayers_API(self):
-        Team1Players = self.matches['Team1Players'].copy()
-        Team2Players = self.matches['Team2Players'].copy()
-
-        all_players = np.unique(Team1Players.str.lstrip("['").str.rstrip("']").str.split("', '").sum() + Team2Players.str.lstrip("['").str.rstrip("']").str.split("', '").sum())
-
-        response = {"total_players": len(all_players), "players": all_players.tolist()}
-        return response
+        return self.catalog['players']
 
     def teamPlayers_API(self, team):
-        valid_teams = self.allTeams_API()['teams']
-        if team not in valid_teams:
+        if team not in self.team_set:
             return {"error": "Invalid team name"}
 
-        # Don't want against player
-        if_team1 = self.matches[self.matches['Team1'] == team].copy()
-        if_team2 = self.matches[self.matches['Team2'] == team].copy()
-        players = np.unique(if_team1['Team1Players'].str.lstrip("['").str.rstrip("']").str.split("', '").sum() + if_team2['Team2Players'].str.lstrip("['").str.rstrip("']").str.split("', '").sum())
-
+        # Only the team's own XIs, not the players it played against
+        players, _ = self.squads.roster(team)
         response = {"team": team, "total_players": len(players), "players": players.tolist()}
         return response
 
+    def playerAppearances_API(self, player, seasons=['All']):
+        # Counted from the playing XIs, so matches without a ball faced or bowled count too
+        if player not in self.player_set:
+            return {"error": "Invalid player name"}
+
+        if not seasons or type(seasons) != list or not all(season in self.season_set for season in seasons):
+            return {"error": "One or more invalid season names provided"}
+
+        by_season = self.squads.appearances(player, seasons)
+        teams = {}
+        for season_teams in by_season.values():
+            for team, matches in season_teams.items():
+                teams[team] = teams.get(team, 0) + matches
+        return {'player': player, 'matches': sum(teams.values()), 'team': teams, 'season': by_season}
+
 
     # team carier team against team
+    @cached_response('team')
     def teamRecord_API(self, team, seasons=['All']):
-        valid_teams = self.allTeams_API()['teams']
-        if team not in valid_teams:
-            return {"error": "Invalid team name"}
-        
-        valid_seasons = self.allSeasons_API()['seasons']
-        if not all(season in valid_seasons for season in seasons):
-            return {"error": "One or more invalid season names provided"}
+        with stage('team.validate'):
+            if team not in self.team_set:
+                return {"error": "Invalid team name"}
 
-        ball_match = self.limited_ball_match.copy()
+            if not all(season in self.season_set for season in seasons):
+                return {"error": "One or more invalid season names provided"}
 
-        if not seasons or seasons == [] or type(seasons) != list:
-            return {'overall': {}, 'against': {'team':{}, 'season':{}}, 'delta':{}, 'help':{}, 'message': 'privide seasons in list os string'}
-        elif 'All' not in seasons:
-            ball_match = ball_match[ball_match['Season'].isin(seasons)].copy()
-        else:
-            pass # return all
+            if not seasons or seasons == [] or type(seasons) != list:
+                return {'overall': {}, 'against': {'team':{}, 'season':{}}, 'delta':{}, 'help':{}, 'message': 'privide seasons in list os string'}
+
+        overall, before_last, groupByAgainstTeam, groupByAgainstSeason = self.engine.team(team, seasons)
 
-        team_df = ball_match[(ball_match['Team1'] == team) | (ball_match['Team2'] == team)].copy()
-        team_df['Against'] = np.where(team_df['Team1'] == team, team_df['Team2'], team_df['Team1'])
-        team_df.Against = team_df.Against.astype('category')
-        beforeLastMatch_df = team_df[team_df.ID < team_df.ID.max()].copy()
-        
-        AgainstTeam, AgainstSeason, delts = {}, {}, {}
-        OverAll = self.teamRecord(team, team_df)
-        BeforeLast = self.teamRecord(team, beforeLastMatch_df)
+        with stage('team.loops'):
+            AgainstTeam, AgainstSeason, delts = {}, {}, {}
+            OverAll = self.teamRecord(team, overall)
+            BeforeLast = self.teamRecord(team, before_last)
 
-        for key in OverAll:
-            delts[key] = round(OverAll.get(key, 0) - BeforeLast.get(key, 0), 2)
+            for key in OverAll:
+                delts[key] = round(OverAll.get(key, 0) - BeforeLast.get(key, 0), 2)
 
-        groupByAgainstTeam = team_df.groupby('Against', observed=False) # observed=False to error in numbers for categorical data
-        for name, data in groupByAgainstTeam:
-            AgainstTeam[name] = self.teamRecord(team, data)
+            for name, data in groupByAgainstTeam.iterrows():
+                AgainstTeam[name] = self.teamRecord(team, data)
 
-        groupByAgainstSeason = team_df.groupby('Season')
-        for name, data in groupByAgainstSeason:
-            AgainstSeason[name] = self.teamRecord(team, data)
+            for name, data in groupByAgainstSeason.iterrows():
+                AgainstSeason[name] = self.teamRecord(team, data)
 
         return {
             'overall': OverAll,
@@ -147,23 +952,38 @@ class IPL:
             }
         }
 
+    def team_sums(self, team, seasons):
+        """TEAM_COUNTERS of team summed overall, before its latest match, and per opponent and per season."""
+        with stage('team.select') as step:
+            team_df = self.entity_rows('team_matches', team, seasons=seasons)
+            step.scanned(team_df)
+
+        # One grouped sum per breakdown, then only the derived rates are computed per group
+        with stage('team.aggregate') as step:
+            overall = team_df[TEAM_COUNTERS].sum()
+            # A team has one row per match, so the record before the latest match is the overall one minus that row
+            before_last = overall - team_df[TEAM_COUNTERS].iloc[team_df.ID.argmax()] if len(team_df) else overall
+            groupByAgainstTeam = team_df.groupby('Against')[TEAM_COUNTERS].sum()
+            groupByAgainstSeason = team_df.groupby('Season')[TEAM_COUNTERS].sum()
+            step.scanned(len(team_df) * 3)
+            step.built(groupByAgainstTeam, groupByAgainstSeason)
+        return overall, before_last, groupByAgainstTeam, groupByAgainstSeason
+
     def teamRecord(self, team, data, against=None):
-        matches_played = data.ID.nunique()
-        win = data[data.WinningTeam == team].ID.nunique() # team win = conceded loss
-        loss = data[data.WinningTeam != team].ID.nunique() # team loss = conceded win
+        # data holds the TEAM_COUNTERS of team_matches summed over the matches of interest
+        matches_played = data['matches']
+        win = data['wins'] # team win = conceded loss
+        loss = data['losses'] # team loss = conceded win
         noResult = matches_played - win - loss
-        title = data[(data.MatchNumber == 'Final') & (data.WinningTeam == team)].ID.nunique()
+        title = data['titles']
         winningPercentage = round((win/matches_played)*100, 2) if matches_played else 0
-        
-        batting_df = data[data.BattingTeam == team]
-        bowling_df = data[data.BattingTeam != team]
 
-        total_runs = batting_df.total_run.sum() # How many runs scored by team # [batsman_run + extras = totals] extras are added to the batting team's total, but are not credited to the batter
-        total_balls = (batting_df.extra_type != 'wides').sum() # How many balls faced by team
-        total_wickets = bowling_df.isWicketDelivery.sum() # How many wickets get by team
-        total_conceded_runs = bowling_df.total_run.sum() # How many runs conceded by team # [batsman_run + extras = totals] extras are added to the batting team's total, but are not credited to the batter
-        total_conceded_balls = (bowling_df.extra_type != 'wides').sum() # How many balls bowled by team
-        total_conceded_wickets = batting_df.isWicketDelivery.sum() # How many wickets lost by team
+        total_runs = data['runs'] # How many runs scored by team # [batsman_run + extras = totals] extras are added to the batting team's total, but are not credited to the batter
+        total_balls = data['balls'] # How many balls faced by team
+        total_wickets = data['wickets'] # How many wickets get by team
+        total_conceded_runs = data['conceded_runs'] # How many runs conceded by team
+        total_conceded_balls = data['conceded_balls'] # How many balls bowled by team
+        total_conceded_wickets = data['conceded_wickets'] # How many wickets lost by team
 
         run_rate = round(total_runs/(total_balls/6), 2) if total_balls and total_conceded_balls else 0
         conceded_run_rate = round(total_conceded_runs/(total_conceded_balls/6), 2) if total_balls and total_conceded_balls else 0
@@ -187,107 +1007,142 @@ class IPL:
 
 
     # batsman carier & batsman against team
+    @cached_response('batsman')
     def batsmanRecord_API(self, batsman, seasons=['All']):
-        valid_players = self.allPlayers_API()['players']
-        if batsman not in valid_players:
-            return {"error": "Invalid player name"}
+        with stage('batting.validate'):
+            if batsman not in self.player_set:
+                return {"error": "Invalid player name"}
 
-        valid_seasons = self.allSeasons_API()['seasons']
-        if not all(season in valid_seasons for season in seasons):
-            return {"error": "One or more invalid season names provided"}
+            if not all(season in self.season_set for season in seasons):
+                return {"error": "One or more invalid season names provided"}
 
-        ball_match = self.limited_ball_match.copy()
+            if not seasons or seasons == [] or type(seasons) != list:
+                return {'overall': {}, 'against': {'team':{}, 'season':{}}, 'delta':{}, 'help':{}, 'message': 'privide seasons in list os string'}
 
-        if not seasons or seasons == [] or type(seasons) != list:
-            return {'overall': {}, 'against': {'team':{}, 'season':{}}, 'delta':{}, 'help':{}, 'message': 'privide seasons in list os string'}
-        elif 'All' not in seasons:
-            ball_match = ball_match[ball_match['Season'].isin(seasons)].copy()
-        else:
-            pass # return all
+        return self.batsmanRecords([batsman], seasons)[batsman]
 
-        # Add BattingTeam: Determine the bowling team using vectorized operations
-        # Use a boolean mask to identify where BattingTeam is equal to Team1
-        mask = ball_match['BattingTeam'] == ball_match['Team1']
-        # Create the BowlingTeam column using where:
-        # If BattingTeam == Team1, use Team2; otherwise, use Team1
-        ball_match['BowlingTeam'] = ball_match['Team2'].where(mask, ball_match['Team1']).astype('category')
-
-        filter_batsman = ball_match[ball_match['batter'] == batsman]
-        beforeLastMatch_df = filter_batsman[filter_batsman.ID < filter_batsman.ID.max()].copy()
-        
-        AgainstTeam, AgainstSeason, delts = {}, {}, {}
-        OverAll = self.batsmanRecord(batsman, ball_match)
-        BeforeLast = self.batsmanRecord(batsman, beforeLastMatch_df)
-
-        for key in OverAll:
-            if key == 'Highest Score':
-                delts[key] = float(OverAll.get(key, 0).replace('*', '')) - float(BeforeLast.get(key, 0).replace('*', ''))
-                continue
-            delts[key] = round(OverAll.get(key, 0) - BeforeLast.get(key, 0), 2)
-
-        groupByAgainstTeam = filter_batsman.groupby('BowlingTeam', observed=False) # observed=False to error in numbers for categorical data
-        for name, data in groupByAgainstTeam:
-            AgainstTeam[name] = self.batsmanRecord(batsman, data)
-
-        groupByAgainstSeason = filter_batsman.groupby('Season')
-        for name, data in groupByAgainstSeason:
-            AgainstSeason[name] = self.batsmanRecord(batsman, data)
+    def batsmanRecords(self, players, seasons):
+        """batsmanRecord_API responses of several players, with one grouped pass per breakdown."""
+        season_bowling_teams = self.season_bowling_teams.values()
 
-        return {
-            'overall': OverAll,
-            'against': {
-                'team': AgainstTeam,
-                'season': AgainstSeason
-            },
-            'delta': delts,
-            'help': {
-                'Innings': 'Total innings played by batsman',
-                'Runs': 'Total runs scored by batsman',
-                'Not Out': 'Total not out innings played by batsman',
-                'Highest Score': 'Highest score made by batsman',
-                'Fifties (50s)': 'Total fifties scored by batsman',
-                'Hundreds (100s)': 'Total hundreds scored by batsman',
-                'Fours': 'Total fours scored by batsman',
-                'Sixes': 'Total sixes scored by batsman',
-                'Average': 'Average runs scored by batsman',
-                'Strike Rate': 'Strike rate of batsman',
-                'Man of Match': 'Number of times batsman Man of Match'
+        if 'All' not in seasons:
+            season_bowling_teams = [self.season_bowling_teams[season] for season in seasons if season in self.season_bowling_teams]
+        else:
+            pass # return all
+        bowling_teams = sorted(frozenset().union(*season_bowling_teams))
+        OverAll, BeforeLast, AgainstTeam, AgainstSeason = (counter_records(counters) for counters in self.engine.batting(players, seasons))
+
+        with stage('batting.loops'):
+            return self.batsmanResponses(players, bowling_teams, OverAll, BeforeLast, AgainstTeam, AgainstSeason)
+
+    def batting_frames(self, players, seasons):
+        """batting_counters of players overall, before their latest match, and per opponent and per season."""
+        with stage('batting.select') as step:
+            innings = self.entity_rows('batting_innings', *players, seasons=seasons)
+            step.scanned(innings)
+
+        # Rows with no deliveries faced only carry a dismissal (e.g. run out at the non-striker's end),
+        # which counts towards the overall record but not towards any innings of the batsman
+        with stage('batting.copy') as step:
+            filter_batsman = innings[innings.deliveries > 0]
+            step.scanned(innings)
+            step.built(filter_batsman)
+
+        # The record before the latest match, for the deltas, comes out of the same pass as the overall one
+        with stage('batting.aggregate') as step:
+            OverAll, BeforeLast = self.batting_totals(innings)
+            AgainstTeam = self.batting_counters(filter_batsman, ['player', 'BowlingTeam'])
+            AgainstSeason = self.batting_counters(filter_batsman, ['player', 'Season'])
+            step.scanned(len(innings) + 2 * len(filter_batsman))
+        return OverAll, BeforeLast, AgainstTeam, AgainstSeason
+
+    def batsmanResponses(self, players, bowling_teams, OverAll, BeforeLast, AgainstTeam, AgainstSeason):
+        responses = {}
+        for batsman in players:
+            overall = self.batsmanRecord(batsman, OverAll.get(batsman))
+            before_last = self.batsmanRecord(batsman, BeforeLast.get(batsman))
+
+            delts = {}
+            for key in overall:
+                if key == 'Highest Score':
+                    delts[key] = float(overall.get(key, 0).replace('*', '')) - float(before_last.get(key, 0).replace('*', ''))
+                    continue
+                delts[key] = round(overall.get(key, 0) - before_last.get(key, 0), 2)
+
+            responses[batsman] = {
+                'overall': overall,
+                'against': {
+                    # Every team that bowled in the selected seasons is listed, even if the batsman never faced it
+                    'team': {name: self.batsmanRecord(batsman, AgainstTeam.get((batsman, name))) for name in bowling_teams},
+                    'season': {name: self.batsmanRecord(batsman, data) for (player, name), data in AgainstSeason.items() if player == batsman}
+                },
+                'delta': delts,
+                'help': {
+                    'Innings': 'Total innings played by batsman',
+                    'Runs': 'Total runs scored by batsman',
+                    'Not Out': 'Total not out innings played by batsman',
+                    'Highest Score': 'Highest score made by batsman',
+                    'Fifties (50s)': 'Total fifties scored by batsman',
+                    'Hundreds (100s)': 'Total hundreds scored by batsman',
+                    'Fours': 'Total fours scored by batsman',
+                    'Sixes': 'Total sixes scored by batsman',
+                    'Average': 'Average runs scored by batsman',
+                    'Strike Rate': 'Strike rate of batsman',
+                    'Man of Match': 'Number of times batsman Man of Match'
+                }
             }
-        }
-    
-    def batsmanRecord(self, batsman_name, df):
-        outs = df[df['player_out'] == batsman_name].shape[0] # may be run out when he was not batting
-
-        batsman_df = df[df['batter'] == batsman_name]
-
-        ball_count = batsman_df.shape[0]
-        innings = batsman_df.ID.nunique()
-        total_runs = batsman_df.batsman_run.sum()
-        fours = batsman_df[(batsman_df.batsman_run == 4) & (batsman_df.non_boundary == 0)].shape[0]
-        sixes = batsman_df[(batsman_df.batsman_run == 6) & (batsman_df.non_boundary == 0)].shape[0]
+        return responses
+
+    def batting_counters(self, df, by, outs='out'):
+        """Sum batting_innings rows per group of `by`, one row per group. `outs` picks the dismissal column:
+        'out' counts dismissals while facing, 'dismissed' also counts those at the non-striker's end."""
+        segments = Segments(df, by)
+        sums = {column: segments.reduce(np.add, df[column].to_numpy()) for column in BATTING_COUNTERS}
+        sums['outs'] = segments.reduce(np.add, df[outs].to_numpy())
+        # The highest score is the maximum of batting_key
+        return self.with_highest(pd.DataFrame(sums, index=segments.index), segments.reduce(np.maximum, batting_key(df)), df)
+
+    def with_highest(self, counters, best, df):
+        counters['highest'] = (best >> 1 & 0xFFFF).astype(df.runs.dtype)
+        counters['highest_out'] = (1 - (best & 1)).astype(df.out.dtype)
+        return counters
+
+    def batting_totals(self, innings):
+        """batting_counters per player of all `innings` rows (outs='dismissed') and of the innings before
+        the player's latest match (outs='out'), without filtering or aggregating the rows twice."""
+        faced = innings.deliveries.to_numpy() > 0
+        index, overall, best, before, best_before, played_before = before_last_match(innings, BATTING_COUNTERS + ['dismissed', 'out'], batting_key(innings), faced)
+        totals = []
+        for sums, outs, maxima, keep in ((overall, 'dismissed', best, slice(None)), (before, 'out', best_before, played_before)):
+            counters = pd.DataFrame({**{column: sums[column] for column in BATTING_COUNTERS}, 'outs': sums[outs]}, index=index)
+            totals.append(self.with_highest(counters, maxima, innings)[keep])
+        return totals
+
+    def batsmanRecord(self, batsman_name, data):
+        # data holds the batting_counters of one group, or None when the batsman has no rows in it
+        data = data or EMPTY_BATTING
+        outs = data['outs']
+        innings = data['innings']
+        total_runs = data['runs']
+        fours = data['fours']
+        sixes = data['sixes']
         avg = round(total_runs/outs, 2) if outs else 0 # np.inf
-        noballs = batsman_df[~(batsman_df.extra_type == 'wides')].shape[0] # number of balls
+        noballs = data['balls'] # number of balls
         strike_rate = round((total_runs/noballs) * 100, 2) if noballs else 0 # np.nan
 
-        inniBatsTotalRuns = batsman_df[['ID', 'batsman_run']].groupby('ID').sum()
-        fifties = inniBatsTotalRuns[(inniBatsTotalRuns.batsman_run >= 50) & (inniBatsTotalRuns.batsman_run < 100)].shape[0]
-        hundreds = inniBatsTotalRuns[inniBatsTotalRuns.batsman_run >= 100].shape[0]
-        highest_score = None
+        fifties = data['fifties']
+        hundreds = data['hundreds']
+        highest_score = np.nan
 
-        try:
-            highest_score = inniBatsTotalRuns.batsman_run.sort_values(ascending=False).head(1).values[0]
-            high_score_ID = inniBatsTotalRuns.batsman_run.sort_values(ascending=False).head(1).index[0]
+        if innings:
+            highest_score = int(data['highest'])
 
             # Check did batsman out while making high_score or not, if out then simply return HIGH SCORE else use ASTRIC (*) mean did not out
-            did_out = (batsman_df[batsman_df.ID == high_score_ID].player_out == batsman_name).any()
-            if not did_out:
+            if not data['highest_out']:
                 highest_score = str(highest_score) + '*'
-                pass
-        except:
-            highest_score = inniBatsTotalRuns.batsman_run.max()
 
         not_out = innings - outs
-        mom = batsman_df['ID'][batsman_df.Player_of_Match == batsman_name].nunique()
+        mom = data['mom']
 
 
         return {
@@ -306,105 +1161,124 @@ class IPL:
 
 
     # bowler carier & bowler against team
+    @cached_response('bowler')
     def bowlerRecord_API(self, bowler, seasons=['All']):
-        valid_players = self.allPlayers_API()['players']
-        if bowler not in valid_players:
-            return {"error": "Invalid player name"}
-
-        valid_seasons = self.allSeasons_API()['seasons']
-        if not all(season in valid_seasons for season in seasons):
-            return {"error": "One or more invalid season names provided"}
-
-        ball_match = self.limited_ball_match.copy()
-
-        if not seasons or seasons == [] or type(seasons) != list:
-            return {'overall': {}, 'against': {'team':{}, 'season':{}}, 'delta':{}, 'help':{}, 'message': 'privide seasons in list os string'}
-        elif 'All' not in seasons:
-            ball_match = ball_match[ball_match['Season'].isin(seasons)].copy()
-        else:
-            pass # return all
-
-        # Add bowler_run, isBowlerWicket: Determine the bowling team using vectorized operations
-        # Use vectorized operations to compute 'bowler_run'
-        ball_match['bowler_run'] = np.where(
-            ball_match['extra_type'].isin(['penalty', 'legbyes', 'byes']),
-            0,  # If extra_type is in ['penalty', 'legbyes', 'byes'], set bowler_run to 0
-            ball_match['total_run']  # Otherwise, set bowler_run to total_run
-        )
-
-        ball_match['isBowlerWicket'] = np.where(
-            ball_match['kind'].isin(['caught', 'caught and bowled', 'bowled', 'stumped', 'lbw', 'hit wicket']),
-            ball_match['isWicketDelivery'],  # If kind is in ['caught', 'caught and bowled', 'bowled', 'stumped', 'lbw', 'hit wicket'], set isBowlerWicket to isWicketDelivery
-            0  # Otherwise, set isBowlerWicket to 0
-        ).astype(np.int8)
-        filter_bowler = ball_match[ball_match['bowler'] == bowler].copy()
-        beforeLastMatch_df = filter_bowler[filter_bowler.ID < filter_bowler.ID.max()].copy()
-        
-        AgainstTeam, AgainstSeason, delts = {}, {}, {}
-        OverAll = self.bowlerRecord(bowler, ball_match)
-        BeforeLast = self.bowlerRecord(bowler, beforeLastMatch_df)
-
-        for key in OverAll:
-            if key == 'Best Figure Fraction':
-                os, bs = OverAll.get(key, '0/0').split('/'), BeforeLast.get(key, '0/0').split('/')
-                delts[key] = f'{int(os[0]) - int(bs[0])}/{int(os[1]) - int(bs[1])}'
-                continue
-            delts[key] = round(OverAll.get(key, 0) - BeforeLast.get(key, 0), 2)
-
-        groupByAgainstTeam = filter_bowler.groupby('BattingTeam', observed=False)
-        for name, data in groupByAgainstTeam:
-            AgainstTeam[name] = self.bowlerRecord(bowler, data)
-
-        groupByAgainstSeason = filter_bowler.groupby('Season')
-        for name, data in groupByAgainstSeason:
-            AgainstSeason[name] = self.bowlerRecord(bowler, data)
-
-        return {
-            'overall': OverAll,
-            'against': {
-                'team': AgainstTeam,
-                'season': AgainstSeason
-            },
-            'delta': delts,
-            'help': {
-                'Innings': 'Total innings bowled by bowler',
-                'Wickets': 'Total wickets taken by bowler',
-                '3+W': 'Total innings where bowler took 3 or more wickets',
-                'Best Figure Fraction': 'Best figure of bowler in fraction',
-                'Average': 'Average runs conceded by bowler',
-                'Economy': 'Economy rate of bowler',
-                'Strike Rate': 'Strike rate of bowler',
-                'Man of Match': 'Number of times bowler Man of Match',
-                'Fours': 'Total fours conceded by bowler',
-                'Sixes': 'Total sixes conceded by bowler',
-                'Best Figure': 'Best figure of bowler'
+        with stage('bowling.validate'):
+            if bowler not in self.player_set:
+                return {"error": "Invalid player name"}
+
+            if not all(season in self.season_set for season in seasons):
+                return {"error": "One or more invalid season names provided"}
+
+            if not seasons or seasons == [] or type(seasons) != list:
+                return {'overall': {}, 'against': {'team':{}, 'season':{}}, 'delta':{}, 'help':{}, 'message': 'privide seasons in list os string'}
+
+        return self.bowlerRecords([bowler], seasons)[bowler]
+
+    def bowlerRecords(self, players, seasons):
+        """bowlerRecord_API responses of several players, with one grouped pass per breakdown."""
+        OverAll, BeforeLast, AgainstTeam, AgainstSeason = (counter_records(counters) for counters in self.engine.bowling(players, seasons))
+
+        with stage('bowling.loops'):
+            return self.bowlerResponses(players, OverAll, BeforeLast, AgainstTeam, AgainstSeason)
+
+    def bowling_frames(self, players, seasons):
+        """bowling_counters of players overall, before their latest match, and per opponent and per season."""
+        with stage('bowling.select') as step:
+            filter_bowler = self.entity_rows('bowling_innings', *players, seasons=seasons)
+            step.scanned(filter_bowler)
+
+        # The record before the latest match, for the deltas, comes out of the same pass as the overall one
+        with stage('bowling.aggregate') as step:
+            OverAll, BeforeLast = self.bowling_totals(filter_bowler)
+            AgainstTeam = self.bowling_counters(filter_bowler, ['player', 'BattingTeam'])
+            AgainstSeason = self.bowling_counters(filter_bowler, ['player', 'Season'])
+            step.scanned(3 * len(filter_bowler))
+        return OverAll, BeforeLast, AgainstTeam, AgainstSeason
+
+    def bowlerResponses(self, players, OverAll, BeforeLast, AgainstTeam, AgainstSeason):
+        responses = {}
+        for bowler in players:
+            overall = self.bowlerRecord(bowler, OverAll.get(bowler))
+            before_last = self.bowlerRecord(bowler, BeforeLast.get(bowler))
+
+            delts = {}
+            for key in overall:
+                if key == 'Best Figure Fraction':
+                    os, bs = overall.get(key, '0/0').split('/'), before_last.get(key, '0/0').split('/')
+                    delts[key] = f'{int(os[0]) - int(bs[0])}/{int(os[1]) - int(bs[1])}'
+                    continue
+                delts[key] = round(overall.get(key, 0) - before_last.get(key, 0), 2)
+
+            responses[bowler] = {
+                'overall': overall,
+                'against': {
+                    # Every batting team is listed, even if the bowler never bowled to it
+                    'team': {name: self.bowlerRecord(bowler, AgainstTeam.get((bowler, name))) for name in self.codes.teams},
+                    'season': {name: self.bowlerRecord(bowler, data) for (player, name), data in AgainstSeason.items() if player == bowler}
+                },
+                'delta': delts,
+                'help': {
+                    'Innings': 'Total innings bowled by bowler',
+                    'Wickets': 'Total wickets taken by bowler',
+                    '3+W': 'Total innings where bowler took 3 or more wickets',
+                    'Best Figure Fraction': 'Best figure of bowler in fraction',
+                    'Average': 'Average runs conceded by bowler',
+                    'Economy': 'Economy rate of bowler',
+                    'Strike Rate': 'Strike rate of bowler',
+                    'Man of Match': 'Number of times bowler Man of Match',
+                    'Fours': 'Total fours conceded by bowler',
+                    'Sixes': 'Total sixes conceded by bowler',
+                    'Best Figure': 'Best figure of bowler'
+                }
             }
-        }
+        return responses
+
+    def bowling_counters(self, df, by):
+        """Sum bowling_innings rows per group of `by`, one row per group, with the best figure of each group."""
+        segments = Segments(df, by)
+        sums = {column: segments.reduce(np.add, df[column].to_numpy()) for column in BOWLING_COUNTERS}
+        # The best figure is the maximum of bowling_key
+        return self.with_best_figure(pd.DataFrame(sums, index=segments.index), segments.reduce(np.maximum, bowling_key(df)), df)
+
+    def with_best_figure(self, counters, best, df):
+        counters['best_wickets'] = (best >> 16).astype(df.wickets.dtype)
+        counters['best_runs'] = (0xFFFF - (best & 0xFFFF)).astype(df.runs.dtype)
+        return counters
+
+    def bowling_totals(self, innings):
+        """bowling_counters per player of all `innings` rows and of those before the player's latest match,
+        without filtering or aggregating the rows twice."""
+        counted = np.ones(len(innings), dtype=bool)
+        index, overall, best, before, best_before, played_before = before_last_match(innings, BOWLING_COUNTERS, bowling_key(innings), counted)
+        return (
+            self.with_best_figure(pd.DataFrame(overall, index=index), best, innings),
+            self.with_best_figure(pd.DataFrame(before, index=index), best_before, innings)[played_before],
+        )
 
-    def bowlerRecord(self, bowler_name, df):
-        bowler_df = df[df['bowler'] == bowler_name]
+    def bowlerRecord(self, bowler_name, data):
+        # data holds the bowling_counters of one group, or None when the bowler has no rows in it
+        data = data or EMPTY_BOWLING
 
-        innings = bowler_df.ID.unique().shape[0]
-        noballs = bowler_df[~(bowler_df.extra_type.isin(['wides', 'noballs']))].shape[0]
-        total_runs = bowler_df['bowler_run'].sum()
+        innings = data['innings']
+        noballs = data['balls']
+        total_runs = data['runs']
         eco = round((total_runs/noballs) * 6, 2) if noballs else 0
-        fours = bowler_df[(bowler_df.batsman_run == 4) & (bowler_df.non_boundary == 0)].shape[0]
-        sixes = bowler_df[(bowler_df.batsman_run == 6) & (bowler_df.non_boundary == 0)].shape[0]
+        fours = data['fours']
+        sixes = data['sixes']
 
-        wicket = bowler_df.isBowlerWicket.sum()
+        wicket = data['wickets']
         avg = round((total_runs/wicket), 2) if wicket else 0 # np.inf
         strike_rate = round((noballs/wicket) * 6, 2) if wicket else 0 # np.nan
 
-        groupByID = bowler_df[['ID','isBowlerWicket', 'bowler_run']].groupby('ID').sum()
-        w3 = groupByID[(groupByID.isBowlerWicket >= 3)].shape[0]
+        w3 = data['w3']
 
-        best_wicket = groupByID.sort_values(['isBowlerWicket', 'bowler_run'], ascending=[False, True]).head(1).values
-        best_figure_fraction = f'{best_wicket[0][0]}/{best_wicket[0][1]}' if best_wicket.size > 0 else '0/0'
+        best_figure_fraction = f"{int(data['best_wickets'])}/{int(data['best_runs'])}" if innings else '0/0'
 
         num, den = best_figure_fraction.split('/')
         best_figure = int(num)/int(den) if int(den) != 0 else 0
 
-        mom = bowler_df[bowler_df.Player_of_Match == bowler_name].drop_duplicates('ID', keep='first').shape[0]
+        mom = data['mom']
 
         return {
             'Innings': int(innings),
@@ -422,18 +1296,327 @@ class IPL:
 
 
     # player against player
-    def playerComparison_API(self, *players):
-        valid_players = self.allPlayers_API()['players']
-        # Check if all provided player are valid
-        if not all(player in valid_players for player in players):
-            return {"error": "One or more invalid team names provided"}
+    def playerComparison_API(self, *players, seasons=['All']):
+        with stage('comparison.validate'):
+            # Check if all provided player are valid
+            if not all(player in self.player_set for player in players):
+                return {"error": "One or more invalid team names provided"}
 
-        response = {'batsman_comparison': {}, 'bowler_comparison': {}}
-        for player in players:
-            response['batsman_comparison'][player] = self.batsmanRecord_API(player)
-            response['bowler_comparison'][player] = self.bowlerRecord_API(player)
+            if not seasons or type(seasons) != list or not all(season in self.season_set for season in seasons):
+                return {"error": "One or more invalid season names provided"}
 
-        return response
+        # All players are computed together, in one grouped pass per breakdown
+        players = list(dict.fromkeys(players))
+        return {
+            'batsman_comparison': self.batsmanRecords(players, seasons),
+            'bowler_comparison': self.bowlerRecords(players, seasons),
+        }
+
+
+    # batter against bowler
+    def headToHead_API(self, batter, bowler, seasons=['All']):
+        if batter not in self.player_set or bowler not in self.player_set:
+            return {"error": "Invalid player name"}
+
+        if not seasons or type(seasons) != list or not all(season in self.season_set for season in seasons):
+            return {"error": "One or more invalid season names provided"}
+
+        by_season = self.matchups.pair(batter, bowler, seasons)
+        overall = {column: sum(counters[column] for counters in by_season.values()) for column in MATCHUP_COUNTERS}
+        return {
+            'batter': batter,
+            'bowler': bowler,
+            'overall': self.matchupRecord(overall),
+            'season': {season: self.matchupRecord(counters) for season, counters in by_season.items()},
+        }
+
+    def topMatchups_API(self, player, role='batter', sort_by='Runs', seasons=['All'], min_balls=0, limit=10):
+        if player not in self.player_set:
+            return {"error": "Invalid player name"}
+
+        if role not in ('batter', 'bowler'):
+            return {"error": "Invalid role, use batter or bowler"}
+
+        if sort_by not in MATCHUP_METRICS:
+            return {"error": "Invalid metric to sort by"}
+
+        if not seasons or type(seasons) != list or not all(season in self.season_set for season in seasons):
+            return {"error": "One or more invalid season names provided"}
+
+        if min_balls < 0 or limit < 1:
+            return {"error": "min_balls must not be negative and limit must be positive"}
+
+        opponents, counters = self.matchups.opponents(player, role, seasons)
+        records = [{'Opponent': opponent, **self.matchupRecord(dict(zip(MATCHUP_COUNTERS, row)))} for opponent, row in zip(opponents, counters.tolist())]
+        records = sorted((record for record in records if record['Balls'] >= min_balls), key=lambda record: (-record[sort_by], -record['Balls'], record['Opponent']))
+        return {
+            'player': player,
+            'role': role,
+            'sort_by': sort_by,
+            'seasons': seasons,
+            'total_opponents': len(records),
+            'matchups': records[:limit],
+        }
+
+    def matchupRecord(self, data):
+        # data holds the MATCHUP_COUNTERS of a batter against a bowler
+        balls, runs, dismissals = data['balls'], data['runs'], data['dismissals']
+        return {
+            'Balls': int(balls),
+            'Runs': int(runs),
+            'Dismissals': int(dismissals),
+            'Dots': int(data['dots']),
+            'Fours': int(data['fours']),
+            'Sixes': int(data['sixes']),
+            'Strike Rate': round(runs / balls * 100, 2) if balls else 0,
+            'Average': round(runs / dismissals, 2) if dismissals else 0,
+            'Dot %': round(data['dots'] / balls * 100, 2) if balls else 0,
+        }
+
+
+    # leaderboard of all players
+    def leaderboard_API(self, kind='batting', seasons=['All'], sort_by=None, ascending=False, min_innings=0, limit=10, offset=0):
+        with stage('leaderboard.validate'):
+            if kind not in LEADERBOARD_METRICS:
+                return {"error": "Invalid leaderboard, use batting or bowling"}
+
+            sort_by = sort_by or LEADERBOARD_METRICS[kind][0]
+            if sort_by not in LEADERBOARD_METRICS[kind]:
+                return {"error": "Invalid metric to sort by"}
+
+            if not seasons or type(seasons) != list or not all(season in self.season_set for season in seasons):
+                return {"error": "One or more invalid season names provided"}
+
+            if min_innings < 0 or limit < 1 or offset < 0:
+                return {"error": "min_innings and offset must not be negative and limit must be positive"}
+
+        # The unsorted table of every player is shared by all orderings and pages of the same seasons
+        with stage('leaderboard.aggregate') as step:
+            table = self.response_cache.get_or_compute(('leaderboard', kind, season_key(seasons), self.version), lambda: self.leaderboard_table(kind, seasons))
+            step.scanned(table)
+
+        with stage('leaderboard.sort') as step:
+            table = table[table['Innings'] >= min_innings]
+            keys = LEADERBOARD_SORT_KEYS.get(sort_by, [(sort_by, False)])
+            columns = [column for column, _ in keys] + ['Player']
+            orders = [column_ascending != ascending for _, column_ascending in keys] + [True]
+            page = table.sort_values(columns, ascending=orders, kind='stable').iloc[offset:offset + limit]
+            step.scanned(table)
+            step.built(table)
+
+        with stage('leaderboard.loops'):
+            players = page[['Player'] + LEADERBOARD_METRICS[kind]].to_dict('records')
+            for rank, player in enumerate(players, start=offset + 1):
+                player['Rank'] = rank
+
+        return {
+            'kind': kind,
+            'seasons': seasons,
+            'sort_by': sort_by,
+            'order': 'asc' if ascending else 'desc',
+            'min_innings': min_innings,
+            'total_players': len(table),
+            'offset': offset,
+            'limit': limit,
+            'players': players,
+        }
+
+    def leaderboard_table(self, kind, seasons):
+        """One row per player with every leaderboard metric of `kind`, from one grouped pass."""
+        if kind == 'batting':
+            c = self.combine_partials('batting', seasons)
+            c = c[c.innings > 0]
+            table = pd.DataFrame({
+                'Runs': c.runs,
+                'Innings': c.innings,
+                'Not Out': c.innings - c.outs,
+                'Highest Score': c.highest.astype(int).astype(str) + np.where(c.highest_out, '', '*'),
+                'Average': np.where(c.outs > 0, c.runs / c.outs, 0).round(2),
+                'Strike Rate': np.where(c.balls > 0, c.runs / c.balls * 100, 0).round(2),
+                'Fifties (50s)': c.fifties,
+                'Hundreds (100s)': c.hundreds,
+                'Fours': c.fours,
+                'Sixes': c.sixes,
+                'Balls': c.balls,
+                'highest': c.highest,
+                'highest_out': c.highest_out,
+            })
+        else:
+            c = self.combine_partials('bowling', seasons)
+            table = pd.DataFrame({
+                'Wickets': c.wickets,
+                'Innings': c.innings,
+                'Best Figure Fraction': c.best_wickets.astype(str) + '/' + c.best_runs.astype(str),
+                'Average': np.where(c.wickets > 0, c.runs / c.wickets, 0).round(2),
+                'Economy': np.where(c.balls > 0, c.runs / c.balls * 6, 0).round(2),
+                'Strike Rate': np.where(c.wickets > 0, c.balls / c.wickets * 6, 0).round(2),
+                '3+W': c.w3,
+                'Runs': c.runs,
+                'Balls': c.balls,
+                'Fours': c.fours,
+                'Sixes': c.sixes,
+                'best_wickets': c.best_wickets,
+                'best_runs': c.best_runs,
+            })
+        return table.rename_axis('Player').reset_index().astype({'Player': str})
+
+    def partials_of(self, batting_innings, bowling_innings):
+        """Leaderboard counters per (player, season) of innings rows; leaderboards combine these instead of the rows."""
+        return {
+            'batting': self.batting_counters(batting_innings, ['player', 'Season'], outs='dismissed'),
+            'bowling': self.bowling_counters(bowling_innings, ['player', 'Season']),
+        }
+
+    def combine_partials(self, kind, seasons):
+        """Leaderboard counters per player over `seasons`, reading only the season partials asked for."""
+        partials = self.season_partials[kind]
+        if 'All' not in seasons:
+            partials = partials[partials.index.get_level_values('Season').isin(seasons)]
+        return self.reduce_partials(kind, partials, 'player')
+
+    def reduce_partials(self, kind, partials, by):
+        """Combine counter rows per index level(s) `by`: counters add up, the best score or figure is the best of the rows."""
+        best = LEADERBOARD_SORT_KEYS['Highest Score' if kind == 'batting' else 'Best Figure Fraction']
+        columns = [column for column, _ in best]
+        counters = partials.drop(columns=columns).groupby(level=by, observed=True).sum()
+
+        # A batting partial without innings (only a run out at the non-striker's end) never holds the highest score
+        ranked = partials.assign(batted=partials.innings > 0).sort_values(['batted'] + columns, ascending=[False] + [ascending for _, ascending in best], kind='stable')
+        counters[columns] = ranked.groupby(level=by, observed=True)[columns].first()
+        return counters
+
+
+    # ad-hoc queries over the deliveries
+    def query_API(self, family='batting', filters={}, group_by=[], metrics=None, sort_by=None, ascending=False, limit=None):
+        """`metrics` of `family` over the deliveries matching every {dimension: value or values} filter,
+        one row per group of the `group_by` dimensions, e.g. the death-over batting of 2022:
+
+            query_API('batting', {'phase': 'death', 'season': '2022'}, ['batter'], sort_by='Runs', limit=10)
+        """
+        with stage('query.validate'):
+            if family not in QUERY_METRICS:
+                return {"error": "Invalid metric family, use batting, bowling or team"}
+
+            if type(filters) != dict or not all(dimension in QUERY_DIMENSIONS for dimension in filters):
+                return {"error": f"Invalid filter, use one of {', '.join(QUERY_DIMENSIONS)}"}
+            filters = {dimension: values if type(values) == list else [values] for dimension, values in filters.items()}
+            for dimension, values in filters.items():
+                if not values or not all(self.query_index.code(dimension, value) is not None for value in values):
+                    return {"error": f"One or more invalid {dimension} values provided"}
+
+            if type(group_by) != list or not all(dimension in QUERY_DIMENSIONS for dimension in group_by) or len(set(group_by)) != len(group_by):
+                return {"error": f"Invalid group_by, use distinct dimensions of {', '.join(QUERY_DIMENSIONS)}"}
+
+            metrics = metrics or QUERY_METRICS[family]
+            if type(metrics) != list or not all(metric in QUERY_METRICS[family] for metric in metrics):
+                return {"error": f"Invalid metric, use {', '.join(QUERY_METRICS[family])}"}
+
+            sort_by = sort_by or metrics[0]
+            if sort_by not in metrics:
+                return {"error": "Invalid metric to sort by"}
+
+            if limit is not None and limit < 1:
+                return {"error": "limit must be positive"}
+
+        # Every filter is a bitmap of rows, so any combination is a few bitwise operations
+        # Team matches and wins come from team_matches, unless the query is about only some deliveries
+        # of a match (an innings, overs or players), when they are the matches the team batted in
+        per_match = family == 'team' and all(dimension in QUERY_MATCH_DIMENSIONS for dimension in [*filters, *group_by])
+        with stage('query.select') as step:
+            rows = self.query_index.select(filters)
+            team_rows = self.query_match_index.select(filters) if per_match else rows[:0]
+            step.scanned(len(rows) + len(team_rows))
+
+        with stage('query.aggregate') as step:
+            (inverse, team_inverse), columns = self.query_index.groups(group_by, self.query_index.keys(group_by, rows), self.query_match_index.keys(group_by, team_rows) if per_match else rows[:0])
+            count = len(columns[group_by[0]]) if group_by else 1
+            counters = self.query_counts(family, rows, inverse, count)
+            if per_match:
+                counters['matches'] = np.bincount(team_inverse, minlength=count)
+                counters['wins'] = np.bincount(team_inverse, weights=self.team_matches.wins.to_numpy()[team_rows], minlength=count).astype(np.int64)
+            table = pd.DataFrame({**columns, **self.query_metrics(family, counters)})[group_by + metrics]
+            step.scanned(len(rows) * (len(counters) + len(group_by)))
+            step.built(table)
+
+        with stage('query.sort'):
+            table = table.sort_values([sort_by] + group_by, ascending=[ascending] + [True] * len(group_by), kind='stable')
+            records = table.iloc[:limit].to_dict('records')
+
+        return {
+            'family': family,
+            'filters': filters,
+            'group_by': group_by,
+            'metrics': metrics,
+            'sort_by': sort_by,
+            'order': 'asc' if ascending else 'desc',
+            'deliveries': len(rows),
+            'total_groups': len(table),
+            'rows': records,
+        }
+
+    def query_counts(self, family, rows, inverse, count):
+        """Counters of `family` summed per group, and its innings (or matches and wins) counted per group."""
+        counters = {column: np.bincount(inverse, weights=values.to_numpy()[rows], minlength=count).astype(np.int64) for column, values in self.query_counters[family].items()}
+
+        # A player bats or bowls once per match, and a team bats once, so innings are distinct (group, entity, match)
+        entity_dimension = QUERY_ENTITIES[family]
+        entity = self.query_index.codes[entity_dimension][rows].astype(np.int64)
+        match = self.match_rows(self.deliveries.ID.to_numpy()[rows])
+        span = len(self.query_index.values[entity_dimension]) * len(self.match_table)
+        pairs, first = np.unique(inverse * span + entity * len(self.match_table) + match, return_index=True)
+        innings = np.bincount(pairs // span, minlength=count)
+        if family != 'team':
+            counters['innings'] = innings
+            return counters
+
+        counters['matches'] = innings
+        won = self.match_table.winner.to_numpy()[match[first]] == entity[first]
+        counters['wins'] = np.bincount(pairs[won] // span, minlength=count)
+        return counters
+
+    def query_metrics(self, family, c):
+        """Every QUERY_METRICS of `family` from the counters of query_counts."""
+        ratio = lambda a, b, scale: np.divide(a * scale, b, out=np.zeros(len(a)), where=b > 0).round(2)
+        if family == 'batting':
+            return {
+                'Innings': c['innings'],
+                'Runs': c['runs'],
+                'Balls': c['balls'],
+                'Outs': c['outs'],
+                'Fours': c['fours'],
+                'Sixes': c['sixes'],
+                'Dots': c['dots'],
+                'Average': ratio(c['runs'], c['outs'], 1),
+                'Strike Rate': ratio(c['runs'], c['balls'], 100),
+                'Dot %': ratio(c['dots'], c['balls'], 100),
+                'Boundary %': ratio(c['fours'] + c['sixes'], c['balls'], 100),
+            }
+        if family == 'bowling':
+            return {
+                'Innings': c['innings'],
+                'Balls': c['balls'],
+                'Runs': c['runs'],
+                'Wickets': c['wickets'],
+                'Fours': c['fours'],
+                'Sixes': c['sixes'],
+                'Dots': c['dots'],
+                'Average': ratio(c['runs'], c['wickets'], 1),
+                'Economy': ratio(c['runs'], c['balls'], 6),
+                'Strike Rate': ratio(c['balls'], c['wickets'], 6), # as in bowlerRecord_API, see its strike_rate
+                'Dot %': ratio(c['dots'], c['balls'], 100),
+            }
+        return {
+            'Matches': c['matches'],
+            'Wins': c['wins'],
+            'Runs': c['runs'],
+            'Balls': c['balls'],
+            'Wickets Lost': c['wickets_lost'],
+            'Fours': c['fours'],
+            'Sixes': c['sixes'],
+            'Extras': c['extras'],
+            'Run Rate': ratio(c['runs'], c['balls'], 6),
+            'Win %': ratio(c['wins'], c['matches'], 100),
+        }
 
 
 # if __name__ == '__main__':
@@ -0,0 +1,95 @@
+"""Load test of a running api.py: requests/sec and latency percentiles per endpoint.
+
+    python loadtest.py --url http://127.0.0.1:8000 --duration 10 --concurrency 16
+"""
+import time
+import json
+import random
+import argparse
+import threading
+import http.client
+import urllib.parse
+import numpy as np
+
+
+def fetch(connection, path):
+    connection.request('GET', path)
+    response = connection.getresponse()
+    body = response.read()
+    return response.status, body
+
+
+def endpoint_paths(connection, sample):
+    """Request paths of every endpoint, spread over a random sample of teams and players."""
+    teams = json.loads(fetch(connection, '/api/teams')[1])['teams']
+    players = json.loads(fetch(connection, '/api/allPlayers')[1])['players']
+    players = random.sample(players, min(sample, len(players)))
+    quote = urllib.parse.quote
+
+    return {
+        'teams': ['/api/teams'],
+        'allPlayers': ['/api/allPlayers'],
+        'teamPlayers': [f'/api/teamPlayers?team={quote(team)}' for team in teams],
+        'teamRecord': [f'/api/teamRecord?team={quote(team)}' for team in teams],
+        'batsmanRecord': [f'/api/batsmanRecord?batsman={quote(player)}' for player in players],
+        'bowlerRecord': [f'/api/bowlerRecord?bowler={quote(player)}' for player in players],
+        'leaderboard': [f'/api/leaderboard?kind={kind}&min_innings={n}' for kind in ('batting', 'bowling') for n in (0, 10, 50)],
+    }
+
+
+def run(host, port, paths, duration, concurrency):
+    """Hit one endpoint from `concurrency` keep-alive connections for `duration` seconds."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = fetch(connection, random.choice(paths))
+            local.append(time.perf_counter() - start)
+            failed += status != 200
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'req/s': round(len(latencies) / elapsed, 1),
+        'p50 ms': round(float(np.percentile(latencies, 50)), 2),
+        'p99 ms': round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--players', type=int, default=200, help='players sampled for the player endpoints')
+    parser.add_argument('--endpoint', action='append', help='only these endpoints (repeatable)')
+    args = parser.parse_args()
+
+    url = urllib.parse.urlsplit(args.url)
+    paths = endpoint_paths(http.client.HTTPConnection(url.hostname, url.port), args.players)
+
+    print(f"{'endpoint':<15}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, endpoint in paths.items():
+        if args.endpoint and name not in args.endpoint:
+            continue
+        result = run(url.hostname, url.port, endpoint, args.duration, args.concurrency)
+        print(f"{name:<15}" + ''.join(f"{value:>{10 if key != 'errors' else 8}}" for key, value in result.items()))
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class Cells:
+    """Counter rows summed per integer key and sorted by it, so any key range is two binary searches away."""
+
+    def __init__(self, keys, counters):
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+        self.keys = keys[starts]
+        self.counters = np.add.reduceat(counters[order], starts, axis=0) if len(keys) else counters[:0]
+
+    def range(self, start, stop):
+        """Keys and counters of the cells with start <= key < stop."""
+        first, last = np.searchsorted(self.keys, [start, stop])
+        return self.keys[first:last], self.counters[first:last]
+
+
+class Matchups:
+    """Sparse batter x bowler x season matrix of per-delivery counters, keyed by categorical codes.
+
+    Only the cells of pairs that met are stored, twice: ordered by batter and by bowler, so one
+    pair, or all the opponents of one player, is a contiguous range of either ordering.
+    """
+
+    def __init__(self, batter, bowler, season, counters):
+        # batter, bowler and season are categoricals, counters a frame of one row per delivery
+        self.columns = list(counters.columns)
+        self.batters, self.bowlers, self.seasons = (column.cat.categories.to_numpy() for column in (batter, bowler, season))
+        self.batter_codes = {name: code for code, name in enumerate(self.batters)}
+        self.bowler_codes = {name: code for code, name in enumerate(self.bowlers)}
+        self.season_codes = {name: code for code, name in enumerate(self.seasons)}
+
+        b, w, s = (np.asarray(column.cat.codes, dtype=np.int64) for column in (batter, bowler, season))
+        values = counters.to_numpy(dtype=np.int32)
+        self.n_batters, self.n_bowlers, self.n_seasons = len(self.batters), len(self.bowlers), len(self.seasons)
+        self.by_batter = Cells((b * self.n_bowlers + w) * self.n_seasons + s, values)
+        self.by_bowler = Cells((w * self.n_batters + b) * self.n_seasons + s, values)
+
+    def season_mask(self, keys, seasons):
+        if 'All' in seasons:
+            return slice(None)
+        return np.isin(keys % self.n_seasons, [self.season_codes[season] for season in seasons if season in self.season_codes])
+
+    def pair(self, batter, bowler, seasons=['All']):
+        """{season: counters} of batter against bowler, only the seasons they met in."""
+        if batter not in self.batter_codes or bowler not in self.bowler_codes:
+            return {}
+        start = (self.batter_codes[batter] * self.n_bowlers + self.bowler_codes[bowler]) * self.n_seasons
+        keys, counters = self.by_batter.range(start, start + self.n_seasons)
+        mask = self.season_mask(keys, seasons)
+        return {self.seasons[key % self.n_seasons]: dict(zip(self.columns, row.tolist())) for key, row in zip(keys[mask], counters[mask])}
+
+    def opponents(self, player, role='batter', seasons=['All']):
+        """Counters of `player` against every opponent met over `seasons`: (opponent names, counters matrix)."""
+        codes, cells, opponents = {
+            'batter': (self.batter_codes, self.by_batter, self.bowlers),
+            'bowler': (self.bowler_codes, self.by_bowler, self.batters),
+        }[role]
+        if player not in codes:
+            return opponents[:0], np.zeros((0, len(self.columns)), dtype=np.int32)
+
+        span = len(opponents) * self.n_seasons
+        keys, counters = cells.range(codes[player] * span, (codes[player] + 1) * span)
+        mask = self.season_mask(keys, seasons)
+        keys, counters = keys[mask], counters[mask]
+        if not len(keys):
+            return opponents[:0], counters
+
+        # Cells are ordered by opponent, so the seasons of one opponent are adjacent
+        opponent = keys // self.n_seasons % len(opponents)
+        starts = np.flatnonzero(np.r_[True, opponent[1:] != opponent[:-1]])
+        return opponents[opponent[starts]], np.add.reduceat(counters, starts, axis=0)
@@ -0,0 +1,172 @@
+import os
+import time
+import bisect
+import threading
+import contextlib
+import contextvars
+import tracemalloc
+
+# Upper bounds, in seconds, of the request latency histogram
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+
+class Stage:
+    """One timed step of a request: how long it took, the rows it read and the bytes of the frames it built."""
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.peak_bytes = None # only measured while profiling a request
+
+    def scanned(self, rows):
+        self.rows += rows if isinstance(rows, int) else len(rows)
+
+    def built(self, *frames):
+        for frame in frames:
+            usage = frame.memory_usage(index=False) # a Series of a DataFrame's columns, or a Series' own size
+            self.bytes += int(usage.sum() if hasattr(usage, 'sum') else usage)
+
+    def as_dict(self):
+        return {'stage': self.name, 'ms': round(self.seconds * 1000, 3), 'rows': self.rows, 'bytes': self.bytes, 'peak_bytes': self.peak_bytes}
+
+
+class Profile:
+    """Stages and cache lookups of the request being profiled."""
+
+    def __init__(self):
+        self.stages = []
+        self.cache = {'hits': 0, 'misses': 0}
+
+    def as_dict(self):
+        return {'stages': [stage.as_dict() for stage in self.stages], 'cache': self.cache}
+
+
+class Metrics:
+    """Process-wide totals of stages, requests and cache lookups, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {} # stage -> [calls, seconds, rows, bytes]
+        self.requests = {} # (endpoint, status) -> [count, seconds, bucket counts]
+
+    def observe_stage(self, stage):
+        with self.lock:
+            totals = self.stages.setdefault(stage.name, [0, 0.0, 0, 0])
+            totals[0] += 1
+            totals[1] += stage.seconds
+            totals[2] += stage.rows
+            totals[3] += stage.bytes
+
+    def observe_request(self, endpoint, status, seconds):
+        with self.lock:
+            totals = self.requests.setdefault((endpoint, status), [0, 0.0, [0] * len(LATENCY_BUCKETS)])
+            totals[0] += 1
+            totals[1] += seconds
+            bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+            if bucket < len(LATENCY_BUCKETS):
+                totals[2][bucket] += 1
+
+    def exposition(self, cache_stats=None):
+        """Every metric of this process; under gunicorn each worker reports its own, labelled with its pid."""
+        pid = os.getpid()
+        lines = []
+
+        def metric(name, kind, help, samples):
+            # samples are (name suffix, labels, value)
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                labels = ','.join(f'{key}="{escape(value)}"' for key, value in {'pid': pid, **labels}.items())
+                lines.append(f'{name}{suffix}{{{labels}}} {value}')
+
+        with self.lock:
+            stages = {name: list(totals) for name, totals in self.stages.items()}
+            requests = {key: [count, seconds, list(buckets)] for key, (count, seconds, buckets) in self.requests.items()}
+
+        for index, (name, help) in enumerate([
+            ('ipl_stage_calls_total', 'Times a stage ran'),
+            ('ipl_stage_seconds_total', 'Time spent in a stage'),
+            ('ipl_stage_rows_total', 'Rows a stage read'),
+            ('ipl_stage_bytes_total', 'Bytes of the frames a stage built'),
+        ]):
+            metric(name, 'counter', help, [('', {'stage': stage}, totals[index]) for stage, totals in sorted(stages.items())])
+
+        samples = []
+        for (endpoint, status), (count, seconds, buckets) in sorted(requests.items()):
+            labels = {'endpoint': endpoint, 'status': status}
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+                cumulative += bucket
+                samples.append(('_bucket', {**labels, 'le': bound}, cumulative))
+            samples += [('_bucket', {**labels, 'le': '+Inf'}, count), ('_sum', labels, seconds), ('_count', labels, count)]
+        metric('ipl_request_duration_seconds', 'histogram', 'Latency of API requests', samples)
+
+        if cache_stats is not None:
+            metric('ipl_cache_hits_total', 'counter', 'Response cache hits', [('', {}, cache_stats['hits'])])
+            metric('ipl_cache_misses_total', 'counter', 'Response cache misses', [('', {}, cache_stats['misses'])])
+            metric('ipl_cache_entries', 'gauge', 'Responses held in the cache', [('', {}, cache_stats['entries'])])
+            metric('ipl_cache_bytes', 'gauge', 'Estimated size of the cached responses', [('', {}, cache_stats['bytes'])])
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = Metrics()
+current_profile = contextvars.ContextVar('current_profile', default=None)
+
+# tracemalloc is process-wide, so it runs while at least one profiled request does
+tracing_lock = threading.Lock()
+tracing_requests = 0
+
+
+@contextlib.contextmanager
+def profiled():
+    """Profile the stages run inside the block; allocations are traced, which slows them down."""
+    global tracing_requests
+    with tracing_lock:
+        tracing_requests += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    profile = Profile()
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+        with tracing_lock:
+            tracing_requests -= 1
+            if not tracing_requests:
+                tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the block as stage `name`, into the process metrics and the profile of the current request."""
+    record = Stage(name)
+    profile = current_profile.get()
+    traced = None
+    if profile is not None and tracemalloc.is_tracing():
+        # Peaks of concurrent requests overlap, so under load a profiled stage may be charged for others' allocations
+        tracemalloc.reset_peak()
+        traced = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        if profile is not None:
+            if traced is not None and tracemalloc.is_tracing():
+                record.peak_bytes = tracemalloc.get_traced_memory()[1] - traced
+            profile.stages.append(record)
+        METRICS.observe_stage(record)
+
+
+def cache_lookup(hit):
+    """Count a response cache lookup towards the profile of the current request."""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.cache['hits' if hit else 'misses'] += 1
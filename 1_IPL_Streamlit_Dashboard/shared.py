@@ -0,0 +1,63 @@
+import os
+import threading
+import contextlib
+
+
+class SharedDataset:
+    """One read-only dataset per process, shared by every dashboard session.
+
+    Sessions take a lease on the current dataset for the length of a script run. reload() swaps in a
+    freshly loaded one for new leases, and a replaced dataset is let go only once its last lease ends,
+    so a run never mixes two versions and at most the old and the new version are in memory at once.
+    """
+
+    def __init__(self, load, sources=()):
+        self.load = load
+        self.sources = list(sources) # files whose modification reloads the dataset
+        self.lock = threading.Lock()
+        self.reloading = False
+        self.loaded_at = self.modified()
+        self.current = load()
+        self.leases = {id(self.current): [self.current, 0]} # id -> [dataset, number of leases]
+
+    def modified(self):
+        return max((os.path.getmtime(path) for path in self.sources if os.path.exists(path)), default=0)
+
+    @contextlib.contextmanager
+    def lease(self):
+        if self.sources and self.modified() > self.loaded_at:
+            self.reload()
+
+        with self.lock:
+            dataset = self.current
+            self.leases[id(dataset)][1] += 1
+        try:
+            yield dataset
+        finally:
+            with self.lock:
+                entry = self.leases[id(dataset)]
+                entry[1] -= 1
+                if not entry[1] and dataset is not self.current:
+                    del self.leases[id(dataset)] # last session on a replaced version
+
+    def reload(self):
+        """Load the dataset again and publish it to new leases; concurrent calls load it only once."""
+        with self.lock:
+            if self.reloading:
+                return
+            self.reloading = True
+        try:
+            loaded_at = self.modified()
+            dataset = self.load() # outside the lock, sessions keep running on the current version meanwhile
+            with self.lock:
+                previous = self.current
+                self.current, self.loaded_at = dataset, loaded_at
+                self.leases[id(dataset)] = [dataset, 0]
+                if not self.leases[id(previous)][1]:
+                    del self.leases[id(previous)]
+        finally:
+            self.reloading = False
+
+    def stats(self):
+        with self.lock:
+            return {'versions': len(self.leases), 'leases': sum(count for _, count in self.leases.values())}
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from matchups import Cells
+
+
+def parse_squads(matches):
+    """(match ID, season, team, player) name arrays of both playing XIs of every match, parsed from the
+    stringified lists of Team1Players and Team2Players."""
+    sides = [(matches['Team1'], matches['Team1Players']), (matches['Team2'], matches['Team2Players'])]
+    names = pd.concat([players for _, players in sides], ignore_index=True).str.lstrip("['").str.rstrip("']").str.split("', '")
+    size = names.str.len().to_numpy()
+    repeat = lambda column: np.repeat(np.concatenate([np.asarray(column)] * 2), size)
+    return (
+        repeat(matches['ID']),
+        repeat(matches['Season']),
+        np.repeat(np.concatenate([np.asarray(team) for team, _ in sides]), size),
+        np.concatenate(names.to_numpy()) if len(names) else np.array([], dtype=object),
+    )
+
+
+class Squads:
+    """Every player named in a playing XI, as one (match_id, team_code, player_code) row per appearance.
+
+    Teams, players and seasons are coded with the dataset's codes.Codes. The rows are also summed into appearance counts keyed by team, season and player in two orderings, so the
+    squad of a team and the appearances of a player are each a contiguous range of keys.
+    """
+
+    def __init__(self, match_id, season, team, player, codes):
+        self.codes = codes
+        self.team_codes = {name: code for code, name in enumerate(codes.teams)}
+        self.player_codes = {name: code for code, name in enumerate(codes.players)}
+        self.season_codes = {name: code for code, name in enumerate(codes.seasons)}
+        self.n_seasons, self.n_teams, self.n_players = len(codes.seasons), len(codes.teams), len(codes.players)
+
+        self.match_id = np.asarray(match_id, dtype=np.int32)
+        self.season_code = codes.encode('seasons', season)
+        self.team_code = codes.encode('teams', team)
+        self.player_code = codes.encode('players', player)
+        self.players = codes.players[np.unique(self.player_code)] # the players of at least one XI
+
+        s, t, p = (codes.astype(np.int64) for codes in (self.season_code, self.team_code, self.player_code))
+        ones = np.ones((len(p), 1), dtype=np.int32)
+        self.by_team = Cells((t * self.n_seasons + s) * self.n_players + p, ones)
+        self.by_player = Cells((p * self.n_seasons + s) * self.n_teams + t, ones)
+
+    def appended(self, squads, codes):
+        """Squads of these rows and of the parse_squads rows of new matches, coded with `codes`."""
+        rows = (self.match_id, self.codes.names('seasons', self.season_code), self.codes.names('teams', self.team_code), self.codes.names('players', self.player_code))
+        return Squads(*(np.concatenate([old, new]) for old, new in zip(rows, squads)), codes)
+
+    def season_mask(self, seasons, season_codes):
+        if 'All' in seasons:
+            return slice(None)
+        return np.isin(season_codes, [self.season_codes[season] for season in seasons if season in self.season_codes])
+
+    def roster(self, team, seasons=['All']):
+        """Names of the players who played for `team` in `seasons`, sorted, and their appearances for it."""
+        if team not in self.team_codes:
+            return self.codes.players[:0], np.zeros(0, dtype=np.int64)
+        span = self.n_seasons * self.n_players
+        keys, counts = self.by_team.range(self.team_codes[team] * span, (self.team_codes[team] + 1) * span)
+        mask = self.season_mask(seasons, keys // self.n_players % self.n_seasons)
+        codes, counts = keys[mask] % self.n_players, counts[mask, 0]
+        unique, inverse = np.unique(codes, return_inverse=True)
+        return self.codes.players[unique], np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+
+    def appearances(self, player, seasons=['All']):
+        """{season: {team: matches}} of `player`, only the seasons and teams played for."""
+        if player not in self.player_codes:
+            return {}
+        span = self.n_seasons * self.n_teams
+        keys, counts = self.by_player.range(self.player_codes[player] * span, (self.player_codes[player] + 1) * span)
+        mask = self.season_mask(seasons, keys // self.n_teams % self.n_seasons)
+        appearances = {}
+        for key, count in zip(keys[mask].tolist(), counts[mask, 0].tolist()):
+            appearances.setdefault(self.codes.seasons[key // self.n_teams % self.n_seasons], {})[self.codes.teams[key % self.n_teams]] = count
+        return appearances
+
@@ -0,0 +1,6 @@
+# WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# The dataset is loaded here, at import, so with preload_app it lives in the master and is shared by every worker;
+# loaded lazily or in a thread instead, every worker would build its own copy after the fork
+from api import create_app
+
+app = create_app(warm_up='eager')
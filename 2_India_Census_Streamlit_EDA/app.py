@@ -4,14 +4,16 @@ import streamlit as st
 import plotly.express as px
 from population import IND_POPULATION
 
+@st.cache_resource(show_spinner="Loading census data...")
+def shared_population():
+    """The census dataset of this process, loaded once and shared read-only by every browser session."""
+    return IND_POPULATION()
+
 class IndiaCensusDashboard:
     """India Census Dashboard to analyze demographic data of India"""
     def __init__(self):
-        # use streamlit session state to initialize the object only once
-        if 'india_population' not in st.session_state:
-            st.session_state['india_population'] = IND_POPULATION()
-        # Accessing the object from the session state
-        self.india_population = st.session_state['india_population']
+        # One object for all sessions (the census tables never change while the app runs), only read from here
+        self.india_population = shared_population()
 
         # Set up the Streamlit sidebar and main layout
         st.set_page_config(page_title="India Census Dashboard", page_icon="🧊", layout='wide' )